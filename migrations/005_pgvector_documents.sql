@@ -0,0 +1,18 @@
+-- Migration: pgvector backend for the vector-store service
+-- Description: Lets documents hold vector records (chunks) keyed by namespace
+-- and record id, with their metadata, next to uploaded files
+
+ALTER TABLE documents
+ADD COLUMN IF NOT EXISTS namespace text NOT NULL DEFAULT 'default',
+ADD COLUMN IF NOT EXISTS record_id text,
+ADD COLUMN IF NOT EXISTS metadata jsonb NOT NULL DEFAULT '{}'::jsonb;
+
+-- Upsert target; rows without a record_id (plain uploads) never conflict
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_namespace_record
+  ON documents(namespace, record_id);
+
+-- Cosine ANN index. PgVectorStore.create_index/drop_index manage it (and
+-- the ivfflat alternative) after this
+CREATE INDEX IF NOT EXISTS idx_documents_embedding_hnsw
+  ON documents USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,182 @@
+"""Cold-start benchmark for the document processor and vector store.
+
+Starts a fresh uvicorn process per run and measures, from spawn:
+
+- ready: time until /health answers (the port is bound and the app is up)
+- first response: time until the first real request (/parse of a small text
+  file, or /search) completes, including any imports or connections that
+  request had to wait for
+
+The service's own /debug/startup report (import and init phases, prewarm
+tasks) is collected for each run as well.
+
+    python cold_start_benchmark.py --runs 5
+    python cold_start_benchmark.py --service vector-store --prewarm off --json
+
+``--first-request-delay`` waits between ready and the first request, to
+see what a prewarmed worker saves when traffic arrives a little later.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import requests
+
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICES = ["document-processor", "vector-store"]
+
+SAMPLE_TEXT = (
+    "MASTER SERVICES AGREEMENT\n\n"
+    "1. Indemnification\n\n"
+    "Contractor shall indemnify the government against third party claims.\n\n"
+    "2. Termination\n\n"
+    "Either party may terminate for convenience with thirty days notice.\n"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def first_request(service: str, base_url: str) -> requests.Response:
+    if service == "document-processor":
+        files = {"file": ("sample.txt", io.BytesIO(SAMPLE_TEXT.encode()), "text/plain")}
+        return requests.post(f"{base_url}/parse", files=files, timeout=120)
+    return requests.post(
+        f"{base_url}/search",
+        json={"query": "indemnification", "top_k": 5, "namespace": "cold-start"},
+        timeout=120
+    )
+
+
+def run_once(service: str, prewarm: bool, delay: float, timeout: float) -> Dict[str, Any]:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "PREWARM": "1" if prewarm else "0"}
+    env.setdefault("PINECONE_FAKE", "1")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=os.path.join(SERVICES_DIR, service),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{service} exited: {process.stderr.read().decode()[-2000:]}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"{service} not ready after {timeout}s")
+            try:
+                if requests.get(f"{base_url}/health", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        ready = time.perf_counter() - start
+
+        if delay:
+            time.sleep(delay)
+        request_start = time.perf_counter()
+        response = first_request(service, base_url)
+        first_response = time.perf_counter() - start
+
+        return {
+            "status": response.status_code,
+            "ready_s": ready,
+            "first_response_s": first_response,
+            "first_request_s": time.perf_counter() - request_start,
+            "startup": requests.get(f"{base_url}/debug/startup", timeout=5).json()
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"runs": len(runs), "statuses": sorted({run["status"] for run in runs})}
+    for key in ("ready_s", "first_request_s", "first_response_s"):
+        values = sorted(run[key] for run in runs)
+        summary[key] = {"median": statistics.median(values), "p95": percentile(values, 95)}
+    # Phase timings from the service itself, median across runs
+    phases: Dict[str, List[float]] = {}
+    for run in runs:
+        for name, seconds in run["startup"]["phases"].items():
+            phases.setdefault(name, []).append(seconds)
+        for name, task in run["startup"]["prewarm"].items():
+            if "seconds" in task:
+                phases.setdefault(f"prewarm.{name}", []).append(task["seconds"])
+    summary["phases_s"] = {name: statistics.median(values) for name, values in phases.items()}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start-to-first-response time")
+    parser.add_argument("--service", choices=SERVICES + ["all"], default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prewarm", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--first-request-delay", type=float, default=0.0,
+                        help="Seconds to wait after /health before the first request")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for /health")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    services = SERVICES if args.service == "all" else [args.service]
+    modes = {"on": [True], "off": [False], "both": [False, True]}[args.prewarm]
+
+    report: Dict[str, Any] = {}
+    for service in services:
+        for prewarm in modes:
+            runs = [run_once(service, prewarm, args.first_request_delay, args.timeout)
+                    for _ in range(args.runs)]
+            report[f"{service} prewarm={'on' if prewarm else 'off'}"] = summarize(runs)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    header = (f"{'service':<34}{'ready p50':>11}{'ready p95':>11}"
+              f"{'first p50':>11}{'first p95':>11}{'request p50':>13}")
+    print(header)
+    print("-" * len(header))
+    for name, summary in report.items():
+        print(
+            f"{name:<34}"
+            f"{summary['ready_s']['median'] * 1000:>9.0f}ms{summary['ready_s']['p95'] * 1000:>9.0f}ms"
+            f"{summary['first_response_s']['median'] * 1000:>9.0f}ms"
+            f"{summary['first_response_s']['p95'] * 1000:>9.0f}ms"
+            f"{summary['first_request_s']['median'] * 1000:>11.0f}ms"
+        )
+        if summary["statuses"] != [200]:
+            print(f"  warning: first request returned {summary['statuses']}")
+    print()
+    for name, summary in report.items():
+        phases = ", ".join(f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in summary["phases_s"].items())
+        print(f"{name}: {phases}")
+
+
+if __name__ == "__main__":
+    main()
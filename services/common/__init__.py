@@ -0,0 +1 @@
+# Shared modules for the Deal Velocity Python services
@@ -0,0 +1,397 @@
+"""Metrics, trace spans and slow-request profiling for the Python services.
+
+Usage from a service's main.py:
+
+    app = FastAPI(...)
+    instrument_app(app, "vector-store")
+
+    with stage("pinecone.search"):
+        ...
+
+``instrument_app`` installs an ASGI middleware that times every request,
+counts bytes in and out, assigns or propagates an ``X-Request-ID`` and a
+W3C ``traceparent``, and mounts a Prometheus ``/metrics`` endpoint.
+``stage`` records a per-stage latency histogram and a child span of the
+current request. ``outgoing_headers`` returns the headers to forward on
+calls to the other service so both ends share a trace.
+
+Environment:
+    TRACE_LOG=1            Log each finished span as a JSON line
+    DEBUG_TRACES=1         Keep recent spans and serve them at /debug/traces
+                           (unauthenticated; span attributes include
+                           filenames and namespaces)
+    PROFILE_SLOW_MS=<ms>   Sample stacks during requests and dump the hot
+                           ones for requests slower than the threshold
+    PROFILE_INTERVAL_MS    Sampling interval (default 5)
+    PROFILE_DIR            Directory for collapsed-stack dumps (optional)
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter as PromCounter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+logger = logging.getLogger("deal_velocity.trace")
+
+SERVICE_NAME = "unknown"
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+REQUEST_COUNT = PromCounter(
+    "dv_http_requests_total", "HTTP requests handled",
+    ["service", "endpoint", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "dv_http_request_duration_seconds", "HTTP request latency",
+    ["service", "endpoint", "method"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "dv_http_requests_in_flight", "HTTP requests currently being handled",
+    ["service"]
+)
+REQUEST_BYTES = PromCounter(
+    "dv_http_request_bytes_total", "Request body bytes received",
+    ["service", "endpoint"]
+)
+RESPONSE_BYTES = PromCounter(
+    "dv_http_response_bytes_total", "Response body bytes sent",
+    ["service", "endpoint"]
+)
+STAGE_LATENCY = Histogram(
+    "dv_stage_duration_seconds", "Latency of individual processing stages",
+    ["service", "stage"], buckets=LATENCY_BUCKETS
+)
+QUEUE_DEPTH = Gauge(
+    "dv_queue_depth", "Items waiting in internal queues",
+    ["service", "queue"]
+)
+CACHE_LOOKUPS = PromCounter(
+    "dv_cache_lookups_total", "Cache lookups by result (hit rate = hit / all)",
+    ["service", "cache", "result"]
+)
+SLOW_REQUESTS_PROFILED = PromCounter(
+    "dv_slow_requests_profiled_total", "Requests that exceeded PROFILE_SLOW_MS",
+    ["service", "endpoint"]
+)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+# Most recent finished spans, for /debug/traces (only kept with DEBUG_TRACES)
+DEBUG_TRACES = os.getenv("DEBUG_TRACES", "").lower() in ("1", "true", "yes")
+_finished_spans: Deque[Dict[str, Any]] = deque(maxlen=int(os.getenv("TRACE_BUFFER_SIZE", "2000")))
+
+
+class Span:
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+        record = {
+            "service": SERVICE_NAME,
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": _request_id.get(),
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes
+        }
+        if DEBUG_TRACES:
+            _finished_spans.append(record)
+        if os.getenv("TRACE_LOG"):
+            logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Open a child span of the current span (or a new trace)."""
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set("error", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+@contextmanager
+def stage(name: str, **attributes) -> Iterator[Span]:
+    """Time a processing stage into the stage histogram and a span."""
+    with span(name, **attributes) as current:
+        try:
+            yield current
+        finally:
+            STAGE_LATENCY.labels(SERVICE_NAME, name).observe(time.perf_counter() - current.start)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(SERVICE_NAME, cache, "hit" if hit else "miss").inc()
+
+
+def set_queue_depth(queue: str, depth: int):
+    QUEUE_DEPTH.labels(SERVICE_NAME, queue).set(depth)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def outgoing_headers() -> Dict[str, str]:
+    """Headers that carry the current request id and trace to another service."""
+    headers = {}
+    request_id = _request_id.get()
+    if request_id:
+        headers["X-Request-ID"] = request_id
+    current = _current_span.get()
+    if current:
+        headers["traceparent"] = f"00-{current.trace_id}-{current.span_id}-01"
+    return headers
+
+
+def _parse_traceparent(value: str):
+    parts = value.split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+IDLE_LEAVES = {"wait", "select", "poll", "control", "accept", "_wait_for_tstate_lock"}
+
+
+class SamplingProfiler:
+    """Samples every thread's stack while at least one session is open.
+
+    A single background thread serves all concurrent requests. Samples are
+    not attributed to a particular request, so under concurrency a dump
+    shows what the whole process was doing while the slow request ran.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.sessions: Dict[str, Counter] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def begin(self, key: str):
+        with self.lock:
+            self.sessions[key] = Counter()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+                self.thread.start()
+            self.wakeup.set()
+
+    def end(self, key: str) -> Counter:
+        with self.lock:
+            return self.sessions.pop(key, Counter())
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            with self.lock:
+                if not self.sessions:
+                    self.wakeup.clear()
+            if not self.wakeup.is_set():
+                self.wakeup.wait()
+                continue
+
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    stacks.append(stack)
+
+            with self.lock:
+                for samples in self.sessions.values():
+                    samples.update(stacks)
+            time.sleep(self.interval)
+
+
+def _collapse(frame) -> Optional[str]:
+    if frame.f_code.co_name in IDLE_LEAVES:
+        return None
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def _get_profiler() -> Optional[SamplingProfiler]:
+    global _profiler
+    if _profiler is None and os.getenv("PROFILE_SLOW_MS"):
+        _profiler = SamplingProfiler(float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000)
+    return _profiler
+
+
+def _dump_profile(request_id: str, endpoint: str, duration: float, samples: Counter):
+    SLOW_REQUESTS_PROFILED.labels(SERVICE_NAME, endpoint).inc()
+    top = samples.most_common(5)
+    lines = [f"Slow request {request_id} {endpoint} took {duration * 1000:.0f}ms; hot stacks:"]
+    for stack, count in top:
+        lines.append(f"  {count:>5}  {' > '.join(stack.split(';')[-4:])}")
+    print("\n".join(lines))
+
+    profile_dir = os.getenv("PROFILE_DIR")
+    if profile_dir and samples:
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"{int(time.time())}-{request_id}.folded")
+        with open(path, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware for request metrics, tracing and slow-request profiling."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        request_id = headers.get("x-request-id") or uuid.uuid4().hex
+        trace_id, parent_id = _parse_traceparent(headers.get("traceparent", ""))
+
+        root = Span(
+            f"{scope['method']} {scope['path']}",
+            trace_id=trace_id or uuid.uuid4().hex,
+            parent_id=parent_id
+        )
+        request_token = _request_id.set(request_id)
+        span_token = _current_span.set(root)
+
+        counts = {"in": 0, "out": 0}
+        status = {"code": 500}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                counts["in"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            elif message["type"] == "http.response.body":
+                counts["out"] += len(message.get("body", b""))
+            await send(message)
+
+        profiler = _get_profiler() if scope["path"] != "/metrics" else None
+        if profiler:
+            profiler.begin(root.span_id)
+
+        REQUESTS_IN_FLIGHT.labels(self.service).inc()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.labels(self.service).dec()
+            duration = time.perf_counter() - root.start
+
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            REQUEST_COUNT.labels(self.service, endpoint, method, str(status["code"])).inc()
+            REQUEST_LATENCY.labels(self.service, endpoint, method).observe(duration)
+            REQUEST_BYTES.labels(self.service, endpoint).inc(counts["in"])
+            RESPONSE_BYTES.labels(self.service, endpoint).inc(counts["out"])
+
+            root.name = f"{method} {endpoint}"
+            root.set("status", status["code"])
+            root.set("bytes_in", counts["in"])
+            root.set("bytes_out", counts["out"])
+            root.finish()
+            _current_span.reset(span_token)
+
+            if profiler:
+                samples = profiler.end(root.span_id)
+                if duration * 1000 >= float(os.getenv("PROFILE_SLOW_MS")):
+                    _dump_profile(request_id, endpoint, duration, samples)
+
+            _request_id.reset(request_token)
+
+
+def instrument_app(app, service: str):
+    """Install request instrumentation and the /metrics endpoint on a FastAPI app."""
+    global SERVICE_NAME
+    SERVICE_NAME = service
+
+    if os.getenv("TRACE_LOG") and not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+
+    from fastapi import Response
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    if DEBUG_TRACES:
+        @app.get("/debug/traces", include_in_schema=False)
+        async def traces(request_id: Optional[str] = None, limit: int = 200):
+            spans = [
+                s for s in _finished_spans
+                if request_id is None or s["request_id"] == request_id
+            ]
+            return {"spans": spans[-limit:]}
+
+    app.add_middleware(InstrumentationMiddleware, service=service)
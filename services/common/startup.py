@@ -0,0 +1,157 @@
+"""Startup timing and background prewarming shared by the services.
+
+Import this module first in main.py so ``StartupReport`` can time the
+imports that follow:
+
+    startup = StartupReport("document-processor")
+    with startup.phase("import.app"):
+        from processor import process_document
+    ...
+    startup.install(app, prewarm={"parser": prewarm_parser})
+
+``install`` adds a startup hook that prints the timings and starts a
+background thread for the prewarm tasks. Uvicorn runs startup hooks
+before it binds its socket, so the thread first waits until the process
+is listening (up to ``PREWARM_WAIT_SECONDS``), keeping the tasks from
+competing with server startup. ``GET /debug/startup`` returns the report.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import Gauge
+
+STARTUP_SECONDS = Gauge(
+    "dv_startup_seconds", "Time spent in each startup phase",
+    ["service", "phase"]
+)
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was created (Linux), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks after boot; the
+            # command name in field 2 may contain spaces, so split after it
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# How long prewarm waits for the server socket before starting anyway (e.g.
+# behind a unix socket, or under a test client that never binds one)
+PREWARM_WAIT_SECONDS = float(os.getenv("PREWARM_WAIT_SECONDS", "5"))
+
+def is_listening() -> Optional[bool]:
+    """Whether this process holds a listening TCP socket (Linux), else None."""
+    try:
+        inodes = set()
+        for fd in os.listdir("/proc/self/fd"):
+            try:
+                target = os.readlink(f"/proc/self/fd/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                inodes.add(target[len("socket:["):-1])
+    except OSError:
+        return None
+
+    for table in ("/proc/self/net/tcp", "/proc/self/net/tcp6"):
+        try:
+            with open(table) as f:
+                rows = f.read().splitlines()[1:]
+        except OSError:
+            continue
+        for row in rows:
+            fields = row.split()
+            # State 0A is LISTEN; field 9 is the socket inode
+            if len(fields) > 9 and fields[3] == "0A" and fields[9] in inodes:
+                return True
+    return False
+
+def prewarm_enabled(default: bool = False) -> bool:
+    value = os.getenv("PREWARM")
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+class StartupReport:
+    def __init__(self, service: str):
+        self.service = service
+        self.created = time.perf_counter()
+        # Interpreter and server startup that ran before this module
+        self.before_app = process_age()
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        self.listening_at: Optional[float] = None
+        self.prewarm: Dict[str, Dict[str, object]] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            STARTUP_SECONDS.labels(self.service, name).set(self.phases[name])
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "service": self.service,
+            "before_app_seconds": self.before_app,
+            "phases": self.phases,
+            "ready_seconds": self.ready_at,
+            "listening_seconds": self.listening_at,
+            "prewarm": self.prewarm
+        }
+
+    def _mark_ready(self):
+        self.ready_at = (self.before_app or 0.0) + time.perf_counter() - self.created
+        STARTUP_SECONDS.labels(self.service, "ready").set(self.ready_at)
+        phases = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        before = f"{self.before_app * 1000:.0f}ms" if self.before_app is not None else "unknown"
+        print(f"{self.service} startup: process->app {before}, {phases}, ready at {self.ready_at * 1000:.0f}ms")
+
+    def _wait_for_listener(self):
+        deadline = time.perf_counter() + PREWARM_WAIT_SECONDS
+        while time.perf_counter() < deadline:
+            listening = is_listening()
+            if listening is None:
+                return
+            if listening:
+                self.listening_at = (self.before_app or 0.0) + time.perf_counter() - self.created
+                return
+            time.sleep(0.02)
+
+    def _run_prewarm(self, tasks: Dict[str, Callable[[], None]]):
+        self._wait_for_listener()
+        for name, task in tasks.items():
+            self.prewarm[name] = {"state": "running"}
+            start = time.perf_counter()
+            try:
+                task()
+                self.prewarm[name] = {"state": "done", "seconds": time.perf_counter() - start}
+            except Exception as e:
+                self.prewarm[name] = {"state": "failed", "seconds": time.perf_counter() - start, "error": str(e)}
+                print(f"Warning: prewarm '{name}' failed: {e}")
+            STARTUP_SECONDS.labels(self.service, f"prewarm.{name}").set(self.prewarm[name]["seconds"])
+            print(f"{self.service} prewarm {name}: {self.prewarm[name]['state']} "
+                  f"in {self.prewarm[name]['seconds'] * 1000:.0f}ms")
+
+    def install(self, app, prewarm: Optional[Dict[str, Callable[[], None]]] = None):
+        """Report timings at startup and run ``prewarm`` tasks once the server listens."""
+
+        @app.on_event("startup")
+        async def report_startup():
+            self._mark_ready()
+            if prewarm:
+                threading.Thread(target=self._run_prewarm, args=(prewarm,),
+                                 name="prewarm", daemon=True).start()
+
+        @app.get("/debug/startup", include_in_schema=False)
+        async def startup_report():
+            return self.to_dict()
@@ -0,0 +1,207 @@
+import difflib
+import hashlib
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import DocumentChunk
+
+# Sections shorter than this are merged into the next one, mirroring
+# chunk_by_title's combine_text_under_n_chars default
+COMBINE_UNDER_N_CHARS = 500
+
+# chunk(section elements, section_offset, chunk_offset): the offsets are the
+# Titles and chunks that precede the section in the document
+ChunkFn = Callable[[List[Any], int, int], List[DocumentChunk]]
+
+# Position metadata the vector store keeps with a chunk; a chunk whose text
+# is the same but whose position changed is "moved" and must be re-upserted
+POSITION_METADATA = ("page_number", "section_index", "chunk_index")
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+def element_hash(element) -> str:
+    """Content hash of an element; ignores coordinates and page numbers."""
+    payload = f"{element.category}\x1f{_normalize(str(element))}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def split_sections(elements: List[Any], combine_under_n_chars: int = COMBINE_UNDER_N_CHARS) -> List[List[Any]]:
+    """Group elements into sections that start at Title elements.
+
+    These sections are the unit of reuse between versions, so chunks never
+    span two of them.
+    """
+    sections: List[List[Any]] = []
+    current: List[Any] = []
+    current_chars = 0
+
+    for element in elements:
+        if element.category == "Title" and current and current_chars >= combine_under_n_chars:
+            sections.append(current)
+            current, current_chars = [], 0
+        current.append(element)
+        current_chars += len(str(element))
+
+    if current:
+        sections.append(current)
+    return sections
+
+def _fingerprint(elements: List[Any]) -> str:
+    digest = hashlib.sha1()
+    for element in elements:
+        digest.update(element_hash(element).encode("ascii"))
+    return digest.hexdigest()
+
+def _title(elements: List[Any]) -> str:
+    for element in elements:
+        if element.category == "Title":
+            return _normalize(str(element))
+    return ""
+
+def _title_count(elements: List[Any]) -> int:
+    return sum(1 for element in elements if element.category == "Title")
+
+def _chunk_records(section_id: str, chunks: List[DocumentChunk]) -> List[Dict[str, Any]]:
+    """Keep ids the chunker assigned; number the rest by position in the section."""
+    return [
+        {"chunk_id": chunk.chunk_id or f"{section_id}-c{i}", "text": chunk.text, "metadata": chunk.metadata}
+        for i, chunk in enumerate(chunks)
+    ]
+
+class _SectionIds:
+    """Allocates section ids that are unique within a document."""
+
+    def __init__(self, document_id: str, taken: Optional[set] = None):
+        self.document_id = document_id
+        self.taken = set(taken or ())
+
+    def new(self, fingerprint: str) -> str:
+        base = f"{self.document_id}-s{fingerprint[:12]}"
+        section_id, n = base, 1
+        while section_id in self.taken:
+            section_id = f"{base}-{n}"
+            n += 1
+        self.taken.add(section_id)
+        return section_id
+
+def build_sections(
+    elements: List[Any],
+    document_id: str,
+    chunk_section: ChunkFn
+) -> Tuple[List[Dict[str, Any]], List[DocumentChunk]]:
+    """Section and chunk a document with no previous version.
+
+    Returns:
+        (stored sections, response chunks all marked "new")
+    """
+    ids = _SectionIds(document_id)
+    sections = []
+    chunks = []
+    titles = 0
+    for section_elements in split_sections(elements):
+        fingerprint = _fingerprint(section_elements)
+        section_id = ids.new(fingerprint)
+        records = _chunk_records(section_id, chunk_section(section_elements, titles, len(chunks)))
+        titles += _title_count(section_elements)
+        sections.append({
+            "section_id": section_id,
+            "title": _title(section_elements),
+            "fingerprint": fingerprint,
+            "chunks": records
+        })
+        chunks.extend(DocumentChunk(**r, status="new") for r in records)
+    return sections, chunks
+
+def diff_sections(
+    previous_sections: List[Dict[str, Any]],
+    elements: List[Any],
+    document_id: str,
+    chunk_section: ChunkFn
+) -> Tuple[List[Dict[str, Any]], List[DocumentChunk], List[str]]:
+    """Chunk a revised document and mark what changed since a previous version.
+
+    Sections whose fingerprint is unchanged keep their section ids. Changed
+    sections keep the id of the old section they line up with (same title,
+    or same position inside a replaced block), so chunk ids stay stable and
+    an upsert overwrites the old records. Chunks are marked by comparing
+    them with the old chunk of the same id: "modified" if the text differs,
+    "moved" if only the position metadata (``POSITION_METADATA``) differs,
+    else "unchanged". Modified and new chunks need re-embedding; moved ones
+    need their metadata re-upserted.
+
+    Every section is chunked from the current parse, unchanged ones too:
+    fingerprints ignore page numbers and positions, so an edit earlier in
+    the document can move an unchanged section, and its stored metadata
+    would be stale. Chunking is cheap next to partitioning.
+
+    Returns:
+        (stored sections, response chunks, ids of chunks that no longer exist)
+    """
+    new_section_elements = split_sections(elements)
+    new_fingerprints = [_fingerprint(s) for s in new_section_elements]
+    old_fingerprints = [s["fingerprint"] for s in previous_sections]
+
+    ids = _SectionIds(document_id, taken={s["section_id"] for s in previous_sections})
+    sections: List[Dict[str, Any]] = []
+    chunks: List[DocumentChunk] = []
+    removed: List[str] = []
+    # Titles before each new section, for the chunker's section offsets
+    title_offsets = []
+    titles = 0
+    for section_elements in new_section_elements:
+        title_offsets.append(titles)
+        titles += _title_count(section_elements)
+
+    def add_section(j, old_section=None):
+        section_elements = new_section_elements[j]
+        section_id = old_section["section_id"] if old_section else ids.new(new_fingerprints[j])
+        records = _chunk_records(section_id, chunk_section(section_elements, title_offsets[j], len(chunks)))
+        old_chunks = {c["chunk_id"]: c for c in old_section["chunks"]} if old_section else {}
+
+        for record in records:
+            old = old_chunks.get(record["chunk_id"])
+            if old is None:
+                status = "new"
+            elif old["text"] != record["text"]:
+                status = "modified"
+            elif any(old["metadata"].get(key) != record["metadata"].get(key) for key in POSITION_METADATA):
+                status = "moved"
+            else:
+                status = "unchanged"
+            chunks.append(DocumentChunk(**record, status=status))
+
+        new_ids = {r["chunk_id"] for r in records}
+        removed.extend(chunk_id for chunk_id in old_chunks if chunk_id not in new_ids)
+        sections.append({
+            "section_id": section_id,
+            "title": _title(section_elements),
+            "fingerprint": new_fingerprints[j],
+            "chunks": records
+        })
+
+    matcher = difflib.SequenceMatcher(None, old_fingerprints, new_fingerprints, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for offset, old_section in enumerate(previous_sections[i1:i2]):
+                add_section(j1 + offset, old_section)
+            continue
+
+        # Pair changed sections with old ones by title first, then by position
+        unmatched_old = list(previous_sections[i1:i2])
+        pairs = []
+        for j in range(j1, j2):
+            title = _title(new_section_elements[j])
+            match = next((s for s in unmatched_old if title and s["title"] == title), None)
+            if match:
+                unmatched_old.remove(match)
+            pairs.append([j, match])
+        for pair in pairs:
+            if pair[1] is None and unmatched_old:
+                pair[1] = unmatched_old.pop(0)
+
+        for j, old_section in pairs:
+            add_section(j, old_section)
+        for old_section in unmatched_old:
+            removed.extend(c["chunk_id"] for c in old_section["chunks"])
+
+    return sections, chunks, removed
@@ -0,0 +1,229 @@
+"""Parse -> chunk -> upsert pipeline that indexes a document in one pass.
+
+Instead of returning the full parse to the caller and having it re-post
+the chunks to the vector store, an ingest job streams records straight to
+the vector store's /upsert endpoint as they are produced:
+
+    partition + token chunker (thread) --records queue-->
+        batcher/upserter (event loop) --HTTP--> vector-store
+
+Partitioning returns the whole element list, so the parse itself is held
+in memory. Records are produced lazily from it, and the records queue is
+bounded, so a slow vector store pauses the chunker instead of piling up
+chunk text and upload payloads for the whole document.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import httpx
+
+from common.instrumentation import outgoing_headers, set_queue_depth, stage
+from models import IngestStatus, VectorRecord
+from processor import identify_doc_type, partition_source
+from token_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_token_chunks
+from uploads import SpooledUpload
+
+VECTOR_STORE_URL = os.getenv("VECTOR_STORE_URL", "http://vector-store:8001")
+UPSERT_BATCH_SIZE = 96  # Pinecone limit for text records
+UPSERT_CONCURRENCY = int(os.getenv("INGEST_UPSERT_CONCURRENCY", "2"))
+RECORD_QUEUE_SIZE = int(os.getenv("INGEST_RECORD_QUEUE_SIZE", str(UPSERT_BATCH_SIZE * 2)))
+# Flush a partial batch if no new record arrives within this many seconds
+FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5"))
+UPSERT_RETRIES = 3
+MAX_JOBS = 500
+
+_DONE = object()
+
+class IngestJob:
+    def __init__(self, upload: SpooledUpload, namespace: str, document_id: str,
+                 max_tokens: int, overlap_tokens: int):
+        self.upload = upload
+        self.status = IngestStatus(
+            job_id=uuid.uuid4().hex,
+            document_id=document_id,
+            filename=upload.filename,
+            namespace=namespace,
+            bytes=upload.size
+        )
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.started = time.perf_counter()
+        self.done = asyncio.Event()
+
+class IngestManager:
+    """Runs ingest jobs in the background and keeps their progress."""
+
+    def __init__(self, vector_store_url: str = VECTOR_STORE_URL):
+        self.vector_store_url = vector_store_url.rstrip("/")
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self.tasks = set()
+        self.client: Optional[httpx.AsyncClient] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(base_url=self.vector_store_url, timeout=120)
+        return self.client
+
+    def submit(self, upload: SpooledUpload, namespace: str, document_id: Optional[str] = None,
+               max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> IngestJob:
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        job = IngestJob(upload, namespace, document_id or uuid.uuid4().hex, max_tokens, overlap_tokens)
+        self.jobs[job.status.job_id] = job
+        while len(self.jobs) > MAX_JOBS:
+            _, oldest = next(iter(self.jobs.items()))
+            if not oldest.done.is_set():
+                break
+            self.jobs.popitem(last=False)
+
+        task = asyncio.create_task(self._run(job))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def _run(self, job: IngestJob):
+        status = job.status
+        loop = asyncio.get_running_loop()
+        records: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=RECORD_QUEUE_SIZE)
+        cancelled = threading.Event()
+
+        def chunk_stage():
+            try:
+                try:
+                    with stage("ingest.partition", filename=status.filename):
+                        elements = partition_source(job.upload.source, status.filename)
+                finally:
+                    job.upload.close()
+                status.elements = len(elements)
+
+                # Document-level metadata from the first elements
+                head: List[Any] = []
+                for element in elements:
+                    head.append(element)
+                    if sum(len(str(e)) for e in head) >= 1000:
+                        break
+                doc_type = identify_doc_type("\n\n".join(str(e) for e in head))
+
+                for record in iter_token_chunks(
+                    elements,
+                    status.document_id,
+                    max_tokens=job.max_tokens,
+                    overlap_tokens=job.overlap_tokens,
+                    base_metadata={"filename": status.filename, "doc_type": doc_type}
+                ):
+                    if cancelled.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(records.put(record), loop).result()
+                    status.chunks += 1
+            finally:
+                asyncio.run_coroutine_threadsafe(records.put(_DONE), loop).result()
+
+        try:
+            status.state = "running"
+            # Copy the request context so stage spans join the request's trace
+            chunker = loop.run_in_executor(None, contextvars.copy_context().run, chunk_stage)
+            await self._upsert_stage(job, records)
+            await chunker
+            status.state = "completed"
+        except Exception as e:
+            cancelled.set()
+            status.state = "failed"
+            status.error = str(e)
+            # Unblock a chunker waiting on a full records queue
+            while not records.empty():
+                records.get_nowait()
+        finally:
+            status.elapsed_seconds = time.perf_counter() - job.started
+            set_queue_depth("ingest.records", 0)
+            job.done.set()
+
+    async def _upsert_stage(self, job: IngestJob, records: "asyncio.Queue[Any]"):
+        status = job.status
+        semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+        pending = set()
+        failures: List[Exception] = []
+        batch: List[VectorRecord] = []
+
+        async def send(batch: List[VectorRecord]):
+            try:
+                await self._post_batch(status.namespace, batch)
+                status.upserted += len(batch)
+                if status.time_to_first_searchable is None:
+                    status.time_to_first_searchable = time.perf_counter() - job.started
+            except Exception as e:
+                failures.append(e)
+            finally:
+                semaphore.release()
+
+        async def flush():
+            nonlocal batch
+            if not batch:
+                return
+            await semaphore.acquire()
+            task = asyncio.create_task(send(batch))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            batch = []
+
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(records.get(), timeout=FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    await flush()
+                    continue
+                set_queue_depth("ingest.records", records.qsize())
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= UPSERT_BATCH_SIZE:
+                    await flush()
+
+                # Stop at the first failed batch instead of at the end of the document
+                if failures:
+                    raise failures[0]
+
+            await flush()
+            if pending:
+                await asyncio.gather(*pending)
+            if failures:
+                raise failures[0]
+        finally:
+            # On failure, don't leave batches posting after the job has ended
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _post_batch(self, namespace: str, batch: List[VectorRecord]):
+        payload = {
+            "namespace": namespace,
+            "documents": [record.model_dump() for record in batch]
+        }
+        for attempt in range(UPSERT_RETRIES):
+            last_attempt = attempt == UPSERT_RETRIES - 1
+            try:
+                with stage("ingest.upsert", records=len(batch)):
+                    response = await self._client().post("/upsert", json=payload, headers=outgoing_headers())
+            except httpx.TransportError:
+                # Connection errors and timeouts are retried like 5xx responses
+                if last_attempt:
+                    raise
+            else:
+                if last_attempt or (response.status_code < 500 and response.status_code != 429):
+                    response.raise_for_status()
+                    return
+            await asyncio.sleep(0.5 * 2 ** attempt)
@@ -1,30 +1,213 @@
+import os
+import sys
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from models import ProcessResponse
-from processor import process_document
+# Shared modules live in services/common (copied to /app/common in the image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.startup import StartupReport, prewarm_enabled
+
+startup = StartupReport("document-processor")
+
+with startup.phase("import.framework"):
+    from fastapi import FastAPI, HTTPException, Request, Response
+    from common.instrumentation import instrument_app, stage
+
+# unstructured and python-docx are imported on first use (or by prewarm)
+with startup.phase("import.app"):
+    from ingest import IngestManager
+    from models import IngestStatus, ProcessResponse
+    from processor import prewarm_parser, process_document
+    from token_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS
+    from uploads import InvalidUpload, UploadTooLarge, receive_upload
+    from version_store import ParseStore, VersionNotFound
 
 app = FastAPI(title="Deal Velocity Document Processor")
+instrument_app(app, "document-processor")
+
+with startup.phase("init"):
+    # Parsed versions, for incremental re-parsing of revised documents
+    parse_store = ParseStore()
+    # Background parse -> chunk -> upsert jobs
+    ingest_manager = IngestManager()
+
+# PREWARM=1 loads the parser in the background once the server is up, so
+# the first upload doesn't pay for it
+startup.install(app, prewarm={"parser": prewarm_parser} if prewarm_enabled() else None)
+
+def token_options(fields: dict) -> dict:
+    """Read and check ``max_tokens``/``overlap_tokens`` form fields.
+
+    Raises ValueError naming the offending field.
+    """
+    options = {}
+    for name in ("max_tokens", "overlap_tokens"):
+        if fields.get(name):
+            try:
+                options[name] = int(fields[name])
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+    max_tokens = options.get("max_tokens", DEFAULT_MAX_TOKENS)
+    overlap_tokens = options.get("overlap_tokens", DEFAULT_OVERLAP_TOKENS)
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    if overlap_tokens < 0:
+        raise ValueError("overlap_tokens must not be negative")
+    if overlap_tokens >= max_tokens:
+        raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than max_tokens ({max_tokens})")
+    return options
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await ingest_manager.close()
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
-@app.post("/parse", response_model=ProcessResponse)
-async def parse_file(file: UploadFile = File(...)):
-    if not file.filename:
+# Multipart body is parsed by receive_upload, so describe it for the docs
+PARSE_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "document_id": {"type": "string"},
+                        "previous_version_id": {"type": "string"},
+                        "chunking": {"type": "string", "enum": ["title", "tokens"]},
+                        "max_tokens": {"type": "integer"},
+                        "overlap_tokens": {"type": "integer"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+@app.post("/parse", response_model=ProcessResponse, openapi_extra=PARSE_REQUEST_BODY)
+async def parse_file(request: Request):
+    """Parse a document into sections.
+
+    The upload is streamed to a spooled temp file (see uploads.py) and
+    rejected with 413 as soon as it passes MAX_UPLOAD_BYTES.
+
+    Pass the ``version.version_id`` of an earlier parse as
+    ``previous_version_id`` to re-chunk only what changed; chunks are then
+    marked unchanged, moved, modified or new and ``version.removed_chunk_ids``
+    lists chunks that no longer exist.
+
+    ``chunking=tokens`` packs chunks to a token budget (``max_tokens``,
+    ``overlap_tokens``) and also returns them as vector store ``records``.
+    """
+    try:
+        with stage("upload.receive") as span:
+            upload, fields = await receive_upload(request)
+            span.set("bytes", upload.size)
+            span.set("spooled", upload.path is not None)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not upload.filename:
+        upload.close()
         raise HTTPException(status_code=400, detail="No filename provided")
     
     try:
-        content = await file.read()
-        metadata, chunks, full_text = await process_document(content, file.filename)
-        
-        return ProcessResponse(
-            metadata=metadata,
-            sections=chunks,
-            full_text=full_text
+        options = token_options(fields)
+        metadata, chunks, full_text, version, records = await process_document(
+            upload.source,
+            upload.filename,
+            store=parse_store,
+            document_id=fields.get("document_id"),
+            previous_version_id=fields.get("previous_version_id"),
+            chunking=fields.get("chunking") or "title",
+            **options
         )
+        
+        # Serialize here rather than via response_model so the cost shows up
+        # as its own stage (and the response isn't validated a second time)
+        with stage("serialize"):
+            body = ProcessResponse(
+                metadata=metadata,
+                sections=chunks,
+                full_text=full_text,
+                version=version,
+                records=records
+            ).model_dump_json()
+        return Response(content=body, media_type="application/json")
+    except VersionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        upload.close()
+
+INGEST_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "namespace"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "namespace": {"type": "string"},
+                        "document_id": {"type": "string"},
+                        "max_tokens": {"type": "integer"},
+                        "overlap_tokens": {"type": "integer"},
+                        "wait": {"type": "boolean"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+@app.post("/ingest", response_model=IngestStatus, status_code=202, openapi_extra=INGEST_REQUEST_BODY)
+async def ingest_file(request: Request):
+    """Parse, chunk and index a document in the vector store in one pass.
+
+    Records go straight to the vector store's /upsert in batches as they are
+    produced, so the parse never travels back to the caller. Returns the job
+    status immediately; poll GET /ingest/{job_id} for progress, or pass
+    ``wait=true`` to block until the document is indexed.
+    """
+    try:
+        upload, fields = await receive_upload(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    namespace = fields.get("namespace")
+    if not upload.filename or not namespace:
+        upload.close()
+        raise HTTPException(status_code=400, detail="Both a file and a namespace are required")
+
+    try:
+        job = ingest_manager.submit(upload, namespace, document_id=fields.get("document_id"),
+                                    **token_options(fields))
+    except ValueError as e:
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    if fields.get("wait", "").lower() in ("1", "true", "yes"):
+        await job.done.wait()
+    return job.status
+
+@app.get("/ingest/{job_id}", response_model=IngestStatus)
+async def get_ingest_status(job_id: str):
+    job = ingest_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.status
+
 from redline_generator import create_redlined_document
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
@@ -37,7 +220,8 @@ class RedlineRequest(BaseModel):
 @app.post("/redline")
 async def generate_redline(request: RedlineRequest):
     try:
-        file_stream = create_redlined_document(request.original_text, request.changes)
+        with stage("redline.generate"):
+            file_stream = create_redlined_document(request.original_text, request.changes)
         return StreamingResponse(
             file_stream, 
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -5,6 +5,14 @@ from typing import List, Optional, Dict, Any
 class DocumentChunk(BaseModel):
     text: str
     metadata: Dict[str, Any]
+    chunk_id: Optional[str] = None
+    status: Optional[str] = None  # unchanged, moved, modified or new relative to the previous version
+
+class VectorRecord(BaseModel):
+    """Chunk shaped like the vector store's Document model (flat metadata)."""
+    id: str
+    text: str
+    metadata: Dict[str, Any] = {}
 
 class DocumentMetadata(BaseModel):
     filename: str
@@ -14,7 +22,33 @@ class DocumentMetadata(BaseModel):
     extracted_values: List[str]
     page_count: int
 
+class VersionInfo(BaseModel):
+    document_id: str
+    version_id: str
+    previous_version_id: Optional[str] = None
+    removed_chunk_ids: List[str] = []
+    unchanged: int = 0
+    moved: int = 0  # same text, new position metadata
+    modified: int = 0
+    new: int = 0
+
 class ProcessResponse(BaseModel):
     metadata: DocumentMetadata
     sections: List[DocumentChunk]
     full_text: str
+    version: Optional[VersionInfo] = None
+    records: Optional[List[VectorRecord]] = None  # Only with chunking="tokens"
+
+class IngestStatus(BaseModel):
+    job_id: str
+    document_id: str
+    filename: str
+    namespace: str
+    state: str = "queued"  # queued, running, completed or failed
+    bytes: int = 0
+    elements: int = 0
+    chunks: int = 0
+    upserted: int = 0
+    time_to_first_searchable: Optional[float] = None  # seconds until the first batch was indexed
+    elapsed_seconds: Optional[float] = None
+    error: Optional[str] = None
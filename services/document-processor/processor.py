@@ -1,9 +1,15 @@
 
+import importlib
 import re
-from typing import List, Tuple, Dict, Any
-from unstructured.partition.auto import partition
-from unstructured.chunking.title import chunk_by_title
-from models import DocumentChunk, DocumentMetadata
+import uuid
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import BinaryIO, List, Tuple, Dict, Any, Optional, Union
+from common.instrumentation import stage, record_cache_lookup
+from incremental import build_sections, diff_sections
+from models import DocumentChunk, DocumentMetadata, VectorRecord, VersionInfo
+from token_chunker import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_token_chunks
+from version_store import ParseStore, VersionNotFound
 
 def extract_dates(text: str) -> List[str]:
     # Simple regex for dates (YYYY-MM-DD, MM/DD/YYYY, etc.)
@@ -25,28 +31,181 @@ def identify_doc_type(text: str) -> str:
         return 'Invoice'
     return 'Unknown'
 
-async def process_document(file_content: bytes, filename: str) -> Tuple[DocumentMetadata, List[DocumentChunk], str]:
-    from io import BytesIO
+CHUNKING_STRATEGIES = ("title", "tokens")
+
+def chunk_section(elements: List[Any], section_offset: int = 0, chunk_offset: int = 0) -> List[DocumentChunk]:
+    # chunk_by_title metadata carries no positions, so the offsets are unused.
+    # Imported on first use: unstructured is the bulk of the service's import time
+    from unstructured.chunking.title import chunk_by_title
+
+    return [
+        DocumentChunk(text=str(chunk), metadata=chunk.metadata.to_dict())
+        for chunk in chunk_by_title(elements)
+    ]
+
+def token_chunk_section(document_id: str, filename: str, max_tokens: int, overlap_tokens: int):
+    """Chunk function for the token-budget strategy (see token_chunker.py).
+
+    Keeps the ids used so far, so record ids stay unique across sections of
+    the same document.
+    """
+    seen_ids: set = set()
+
+    def chunk(elements: List[Any], section_offset: int = 0, chunk_offset: int = 0) -> List[DocumentChunk]:
+        return [
+            DocumentChunk(text=record.text, metadata=record.metadata, chunk_id=record.id)
+            for record in iter_token_chunks(
+                elements,
+                document_id,
+                max_tokens=max_tokens,
+                overlap_tokens=overlap_tokens,
+                base_metadata={"filename": filename},
+                section_offset=section_offset,
+                chunk_offset=chunk_offset,
+                seen_ids=seen_ids
+            )
+        ]
+    return chunk
+
+def partition_source(source: Union[str, bytes, BinaryIO], filename: str) -> List[Any]:
+    """Partition from a file path (preferred for large inputs), bytes or a file object."""
+    from unstructured.partition.auto import partition
+
+    if isinstance(source, str):
+        return partition(filename=source, metadata_filename=filename)
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    return partition(file=source, metadata_filename=filename)
+
+def prewarm_parser():
+    """Load the parsing stack ahead of the first upload.
+
+    Imports the PDF and DOCX partitioners, whose dependencies otherwise load
+    on first use, then partitions and chunks a small in-memory document so
+    the text partitioner and its NLTK data are loaded too.
+    """
+    for module in ("unstructured.partition.pdf", "unstructured.partition.docx"):
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"Warning: could not prewarm {module}: {e}")
+
+    sample = (b"MASTER SERVICES AGREEMENT\n\n"
+              b"The Contractor shall provide the services described in this agreement.\n")
+    chunk_section(partition_source(sample, "prewarm.txt"))
+
+async def process_document(
+    source: Union[str, bytes, BinaryIO],
+    filename: str,
+    store: Optional[ParseStore] = None,
+    document_id: Optional[str] = None,
+    previous_version_id: Optional[str] = None,
+    chunking: str = "title",
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS
+) -> Tuple[DocumentMetadata, List[DocumentChunk], str, Optional[VersionInfo], Optional[List[VectorRecord]]]:
+    """Partition, chunk and extract metadata from an uploaded document.
+
+    ``source`` is a path, bytes or a readable file object; pass a path for
+    large uploads so the parser reads from disk instead of memory.
+
+    With a ``store``, the parse is saved as a new version. If
+    ``previous_version_id`` is given, chunks keep their ids from that
+    version where their section lines up and are marked unchanged, moved,
+    modified or new; ``VersionNotFound`` is raised if the version is unknown.
+    If the previous version was chunked with other settings (strategy or
+    token budget), the document is re-chunked in full: every chunk is new
+    and the old chunks are listed as removed.
+
+    ``chunking="tokens"`` packs chunks to a token budget instead of using
+    chunk_by_title and also returns them as vector store records (flat
+    metadata, stable ids) that can be upserted as-is.
+    """
+    if chunking not in CHUNKING_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy '{chunking}'")
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    chunk_settings = {"chunking": chunking}
+    if chunking == "tokens":
+        chunk_settings.update(max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+    previous = None
+    if previous_version_id:
+        if store is None:
+            raise ValueError("Incremental parsing requires a parse store")
+        try:
+            previous = store.load(previous_version_id)
+            record_cache_lookup("parse_versions", hit=True)
+        except VersionNotFound:
+            record_cache_lookup("parse_versions", hit=False)
+            raise
     
     # 1. Partition the document
-    elements = partition(file=BytesIO(file_content), metadata_filename=filename)
+    with stage("partition", filename=filename, from_path=isinstance(source, str)) as span:
+        elements = partition_source(source, filename)
+        span.set("elements", len(elements))
     
     # 2. Extract full text
     full_text = "\n\n".join([str(el) for el in elements])
     
-    # 3. Chunking
-    chunks = chunk_by_title(elements)
-    doc_chunks = []
-    for chunk in chunks:
-        doc_chunks.append(DocumentChunk(
-            text=str(chunk),
-            metadata=chunk.metadata.to_dict()
-        ))
+    # 3. Chunking (per section, reusing unchanged sections of the previous version)
+    version = None
+    document_id = document_id or (previous and previous["document_id"]) or uuid.uuid4().hex
+    if chunking == "tokens":
+        chunk_fn = token_chunk_section(document_id, filename, max_tokens, overlap_tokens)
+    else:
+        chunk_fn = chunk_section
+
+    if store is None:
+        with stage("chunk", chunking=chunking) as span:
+            doc_chunks = chunk_fn(elements)
+            span.set("chunks", len(doc_chunks))
+    else:
+        removed: List[str] = []
+        # Versions saved before chunk settings were recorded used chunk_by_title
+        if previous and previous.get("chunk_settings", {"chunking": "title"}) == chunk_settings:
+            with stage("chunk_incremental", chunking=chunking) as span:
+                sections, doc_chunks, removed = diff_sections(
+                    previous["sections"], elements, document_id, chunk_fn
+                )
+                span.set("chunks", len(doc_chunks))
+        else:
+            with stage("chunk", chunking=chunking) as span:
+                sections, doc_chunks = build_sections(elements, document_id, chunk_fn)
+                span.set("chunks", len(doc_chunks))
+            if previous:
+                # Chunked with other settings: nothing lines up, so every chunk
+                # is new and every old chunk not reused by id is removed
+                new_ids = {chunk.chunk_id for chunk in doc_chunks}
+                removed = [c["chunk_id"] for section in previous["sections"] for c in section["chunks"]
+                           if c["chunk_id"] not in new_ids]
+
+        version = VersionInfo(
+            document_id=document_id,
+            version_id=uuid.uuid4().hex,
+            previous_version_id=previous_version_id,
+            removed_chunk_ids=removed,
+            unchanged=sum(1 for c in doc_chunks if c.status == "unchanged"),
+            moved=sum(1 for c in doc_chunks if c.status == "moved"),
+            modified=sum(1 for c in doc_chunks if c.status == "modified"),
+            new=sum(1 for c in doc_chunks if c.status == "new")
+        )
+        with stage("store_version"):
+            store.save({
+                "version_id": version.version_id,
+                "document_id": document_id,
+                "previous_version_id": previous_version_id,
+                "filename": filename,
+                "chunk_settings": chunk_settings,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "sections": sections
+            })
     
     # 4. Metadata Extraction
-    doc_type = identify_doc_type(full_text)
-    dates = extract_dates(full_text)
-    values = extract_values(full_text)
+    with stage("extract_metadata"):
+        doc_type = identify_doc_type(full_text)
+        dates = extract_dates(full_text)
+        values = extract_values(full_text)
     page_count = elements[-1].metadata.page_number if elements and hasattr(elements[-1].metadata, 'page_number') else 1
 
     metadata = DocumentMetadata(
@@ -58,4 +217,11 @@ async def process_document(file_content: bytes, filename: str) -> Tuple[Document
         page_count=page_count or 1
     )
 
-    return metadata, doc_chunks, full_text
+    records = None
+    if chunking == "tokens":
+        records = [
+            VectorRecord(id=chunk.chunk_id, text=chunk.text, metadata=chunk.metadata)
+            for chunk in doc_chunks
+        ]
+
+    return metadata, doc_chunks, full_text, version, records
@@ -1,5 +1,3 @@
-from docx import Document
-from docx.shared import RGBColor
 import io
 import difflib
 import re
@@ -97,6 +95,9 @@ def create_redlined_document(original_text: str, changes: list):
     
     matcher = difflib.SequenceMatcher(None, orig_tokens, final_tokens)
     
+    # python-docx is only needed here; import it on first use
+    from docx import Document
+
     doc = Document()
     para = doc.add_paragraph()
     
@@ -139,6 +140,8 @@ def _add_text_run(para, text, is_deleted=False, is_inserted=False):
     # Simple approach: just add the run. 
     # If it looks bad, we can improve newline handling later.
     
+    from docx.shared import RGBColor
+
     run = para.add_run(text)
     if is_deleted:
         run.font.strike = True
@@ -32,5 +32,66 @@ def test_document_parser():
         if os.path.exists(filename):
             os.remove(filename)
 
+def test_incremental_parse():
+    filename = "sample_contract.txt"
+    with open(filename, "w") as f:
+        f.write("Payment Terms\n\nPayment is due within 30 days of invoice.\n\n"
+                "Liability\n\nLiability is capped at the fees paid.\n")
+
+    try:
+        with open(filename, "rb") as f:
+            first = requests.post("http://localhost:8000/parse", files={"file": f})
+        assert first.status_code == 200
+        version_id = first.json()["version"]["version_id"]
+
+        # Re-parsing the same content against its previous version changes nothing
+        with open(filename, "rb") as f:
+            second = requests.post(
+                "http://localhost:8000/parse",
+                files={"file": f},
+                data={"previous_version_id": version_id}
+            )
+        print(f"Incremental Status Code: {second.status_code}")
+        assert second.status_code == 200
+        version = second.json()["version"]
+        assert version["modified"] == 0 and version["moved"] == 0 and version["new"] == 0
+        assert version["removed_chunk_ids"] == []
+        print(f"SUCCESS: {version['unchanged']} chunks unchanged.")
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+def test_ingest():
+    # Requires the vector store service to be running as well
+    filename = "sample_rfp.txt"
+    with open(filename, "w") as f:
+        f.write("Request for Proposal\n\nThe agency requires cloud infrastructure services.\n")
+
+    try:
+        with open(filename, "rb") as f:
+            response = requests.post(
+                "http://localhost:8000/ingest",
+                files={"file": f},
+                data={"namespace": "test-ingest", "wait": "true"}
+            )
+        print(f"Ingest Status Code: {response.status_code}")
+        assert response.status_code == 202
+        job = response.json()
+        print(f"Ingest state: {job['state']}, upserted {job['upserted']} of {job['chunks']} chunks")
+        assert job["state"] == "completed"
+        assert job["upserted"] == job["chunks"]
+    finally:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+def test_metrics():
+    response = requests.get("http://localhost:8000/metrics")
+    print(f"Metrics Status Code: {response.status_code}")
+    assert response.status_code == 200
+    assert "dv_http_request_duration_seconds" in response.text
+
 if __name__ == "__main__":
     test_document_parser()
+    test_incremental_parse()
+    test_ingest()
+    test_metrics()
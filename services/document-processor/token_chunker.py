@@ -0,0 +1,223 @@
+import hashlib
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import VectorRecord
+
+# Defaults leave headroom under llama-text-embed-v2's 2048 token input limit
+DEFAULT_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+DEFAULT_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+DEFAULT_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "50"))
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+")
+
+def count_tokens(text: str) -> int:
+    """Estimate subword tokens without loading a tokenizer.
+
+    Counts each punctuation mark as one token and each word as one token
+    per started 6 characters, which slightly over-counts typical BPE/
+    SentencePiece output for contract English, so budgets are conservative.
+    """
+    return sum(1 + (len(match) - 1) // 6 for match in TOKEN_PATTERN.findall(text))
+
+def _split_oversized(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """Split text that exceeds the budget at sentences, then at words."""
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        tokens = count_tokens(sentence)
+        if tokens <= max_tokens:
+            pieces.append((sentence, tokens))
+            continue
+        words = sentence.split()
+        window: List[str] = []
+        window_tokens = 0
+        for word in words:
+            word_tokens = count_tokens(word)
+            if window and window_tokens + word_tokens > max_tokens:
+                pieces.append((" ".join(window), window_tokens))
+                window, window_tokens = [], 0
+            window.append(word)
+            window_tokens += word_tokens
+        if window:
+            pieces.append((" ".join(window), window_tokens))
+    return pieces
+
+def _tail(text: str, budget: int) -> Tuple[str, int]:
+    """Trailing whole sentences of ``text`` within ``budget`` tokens, else trailing words."""
+    sentences = SENTENCE_BOUNDARY.split(text)
+    kept: List[str] = []
+    tokens = 0
+    for sentence in reversed(sentences):
+        sentence_tokens = count_tokens(sentence)
+        if tokens + sentence_tokens > budget:
+            break
+        kept.insert(0, sentence)
+        tokens += sentence_tokens
+    if kept:
+        return " ".join(kept), tokens
+
+    words: List[str] = []
+    for word in reversed(text.split()):
+        word_tokens = count_tokens(word)
+        if tokens + word_tokens > budget:
+            break
+        words.insert(0, word)
+        tokens += word_tokens
+    return " ".join(words), tokens
+
+def _flat(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only values Pinecone accepts as metadata (no nesting, no nulls)."""
+    flat = {}
+    for key, value in metadata.items():
+        if isinstance(value, (str, int, float, bool)):
+            flat[key] = value
+        elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+            flat[key] = value
+    return flat
+
+class _Unit:
+    __slots__ = ("text", "tokens", "element_index", "category", "page", "section", "section_index")
+
+    def __init__(self, text: str, tokens: int, element_index: int, category: str, page: Optional[int],
+                 section: str, section_index: int):
+        self.text = text
+        self.tokens = tokens
+        self.element_index = element_index
+        self.category = category
+        self.page = page
+        self.section = section
+        self.section_index = section_index
+
+def iter_token_chunks(
+    elements: Iterable[Any],
+    document_id: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    min_tokens: int = DEFAULT_MIN_TOKENS,
+    base_metadata: Optional[Dict[str, Any]] = None,
+    section_offset: int = 0,
+    chunk_offset: int = 0,
+    seen_ids: Optional[set] = None
+) -> Iterator[VectorRecord]:
+    """Pack elements into chunks of about ``max_tokens`` tokens.
+
+    Consumes elements lazily and yields each chunk as soon as it is full, so
+    it can feed an upsert stream directly. A Title starts a new chunk unless
+    the current one is still under ``min_tokens`` (small fragments are
+    merged forward instead of wasting a record). Within a section,
+    consecutive chunks share up to ``overlap_tokens`` of trailing text,
+    taken as whole elements and then sentences or words of the last one;
+    overlap never crosses a section boundary.
+
+    When a document is chunked one part at a time (see incremental.py),
+    the offsets and ``seen_ids`` carry positions and ids across the calls.
+
+    Args:
+        elements: unstructured elements in document order
+        document_id: Prefix for record ids and ``document_id`` metadata
+        max_tokens: Target and upper bound for a chunk's estimated tokens
+        overlap_tokens: Tokens repeated from the end of the previous chunk
+        min_tokens: Chunks smaller than this absorb the following section
+        base_metadata: Extra flat fields copied onto every record
+        section_offset: Titles that precede ``elements`` in the document
+        chunk_offset: Chunks already emitted for earlier parts
+        seen_ids: Record ids already used in the document; updated in place
+
+    Yields:
+        Records with stable content-derived ids and flat metadata, ready for
+        the vector store's ``Document`` model
+    """
+    base = _flat(dict(base_metadata or {}))
+    base["document_id"] = document_id
+
+    units: List[_Unit] = []
+    buffered_tokens = 0
+    section_title = ""
+    section_index = section_offset - 1
+    chunk_index = chunk_offset
+    seen_ids = set() if seen_ids is None else seen_ids
+
+    def emit() -> VectorRecord:
+        nonlocal chunk_index
+        parts = []
+        previous_element = None
+        for unit in units:
+            if parts:
+                parts.append(" " if unit.element_index == previous_element else "\n\n")
+            parts.append(unit.text)
+            previous_element = unit.element_index
+        text = "".join(parts)
+
+        # A chunk is labelled with the section it starts in
+        section = units[0].section
+        digest = hashlib.sha1(f"{section}\x1f{text}".encode("utf-8")).hexdigest()[:16]
+        record_id = f"{document_id}-{digest}"
+        n = 1
+        while record_id in seen_ids:
+            record_id = f"{document_id}-{digest}-{n}"
+            n += 1
+        seen_ids.add(record_id)
+
+        pages = [unit.page for unit in units if unit.page is not None]
+        metadata = dict(base)
+        metadata.update({
+            "section": section,
+            "section_index": max(units[0].section_index, 0),
+            "chunk_index": chunk_index,
+            "token_count": sum(unit.tokens for unit in units),
+            "element_types": sorted({unit.category for unit in units})
+        })
+        if pages:
+            metadata["page_number"] = min(pages)
+            metadata["page_end"] = max(pages)
+
+        chunk_index += 1
+        return VectorRecord(id=record_id, text=text, metadata=metadata)
+
+    def overlap_tail() -> List[_Unit]:
+        tail: List[_Unit] = []
+        tokens = 0
+        for unit in reversed(units):
+            if tokens + unit.tokens > overlap_tokens:
+                # Contract paragraphs often exceed the overlap on their own
+                text, text_tokens = _tail(unit.text, overlap_tokens - tokens)
+                if text:
+                    tail.insert(0, _Unit(text, text_tokens, unit.element_index, unit.category,
+                                         unit.page, unit.section, unit.section_index))
+                break
+            tail.insert(0, unit)
+            tokens += unit.tokens
+        return tail
+
+    for element_index, element in enumerate(elements):
+        text = str(element).strip()
+        if not text:
+            continue
+        category = getattr(element, "category", "Text")
+        page = getattr(getattr(element, "metadata", None), "page_number", None)
+
+        if category == "Title":
+            if units and buffered_tokens >= min_tokens:
+                yield emit()
+                units, buffered_tokens = [], 0
+            section_title = text
+            section_index += 1
+
+        tokens = count_tokens(text)
+        pieces = [(text, tokens)] if tokens <= max_tokens else _split_oversized(text, max_tokens)
+
+        for piece_text, piece_tokens in pieces:
+            if units and buffered_tokens + piece_tokens > max_tokens:
+                yield emit()
+                units = overlap_tail()
+                buffered_tokens = sum(unit.tokens for unit in units)
+                if buffered_tokens + piece_tokens > max_tokens:
+                    units, buffered_tokens = [], 0
+            units.append(_Unit(piece_text, piece_tokens, element_index, category, page,
+                               section_title, section_index))
+            buffered_tokens += piece_tokens
+
+    if units:
+        yield emit()
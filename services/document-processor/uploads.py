@@ -0,0 +1,185 @@
+import io
+import os
+import tempfile
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+from fastapi import Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+MiB = 1024 * 1024
+
+# Uploads stay in memory up to this size, then spill to a temp file
+SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(8 * MiB)))
+# Hard limit on the uploaded file, enforced while the body streams in
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * MiB)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+MAX_FIELD_BYTES = 64 * 1024
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD_BYTES = 1 * MiB
+
+class UploadTooLarge(Exception):
+    pass
+
+class InvalidUpload(ValueError):
+    pass
+
+class SpooledUpload:
+    """Uploaded file kept in memory until it grows past ``spool_max_bytes``.
+
+    Past the threshold the data moves to a named temp file (keeping the
+    original extension for file type detection), so large documents can be
+    handed to the parser by path instead of as bytes.
+    """
+
+    def __init__(self, filename: str, spool_max_bytes: int = SPOOL_MAX_BYTES, tmp_dir: Optional[str] = UPLOAD_TMP_DIR):
+        self.filename = filename
+        self.spool_max_bytes = spool_max_bytes
+        self.tmp_dir = tmp_dir
+        self.size = 0
+        self.path: Optional[str] = None
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self._file is None and self.size > self.spool_max_bytes:
+            self._rollover()
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._buffer.write(data)
+
+    def _rollover(self):
+        suffix = os.path.splitext(self.filename)[1]
+        self._file = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, dir=self.tmp_dir, delete=False)
+        self.path = self._file.name
+        self._file.write(self._buffer.getbuffer())
+        self._buffer.close()
+        self._buffer = None
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._buffer is not None:
+            self._buffer.seek(0)
+
+    @property
+    def source(self) -> Union[str, BinaryIO]:
+        """Temp file path for spooled uploads, otherwise the in-memory buffer."""
+        return self.path or self._buffer
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def receive_upload(
+    request: Request,
+    field: str = "file",
+    max_bytes: int = MAX_UPLOAD_BYTES
+) -> Tuple[SpooledUpload, Dict[str, str]]:
+    """Stream a multipart/form-data body into a ``SpooledUpload``.
+
+    Unlike ``UploadFile`` + ``await file.read()``, the body is never held in
+    memory beyond the spool threshold, and ``UploadTooLarge`` is raised as
+    soon as the file exceeds ``max_bytes`` rather than after it has been
+    received in full.
+
+    Returns:
+        (the uploaded file, other form fields as strings)
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise InvalidUpload("Expected a multipart/form-data upload")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+
+    fields: Dict[str, str] = {}
+    upload: Optional[SpooledUpload] = None
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "part": None, "name": None}
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"], state["header_value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal upload
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = disposition.get(b"name", b"").decode("utf-8")
+        filename = disposition.get(b"filename")
+        state["name"] = name
+        if filename is not None and name == field and upload is None:
+            upload = SpooledUpload(os.path.basename(filename.decode("utf-8")))
+            state["part"] = upload
+        else:
+            state["part"] = bytearray()
+
+    def on_part_data(data, start, end):
+        part = state["part"]
+        if isinstance(part, SpooledUpload):
+            part.write(data[start:end])
+            if part.size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        else:
+            part += data[start:end]
+            if len(part) > MAX_FIELD_BYTES:
+                raise InvalidUpload(f"Form field '{state['name']}' is too large")
+
+    def on_part_end():
+        part = state["part"]
+        if isinstance(part, bytearray):
+            fields[state["name"]] = part.decode("utf-8")
+        state["headers"], state["part"] = {}, None
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes + MULTIPART_OVERHEAD_BYTES:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError as e:
+        if upload is not None:
+            upload.close()
+        raise InvalidUpload(f"Malformed multipart body: {e}")
+    except Exception:
+        if upload is not None:
+            upload.close()
+        raise
+
+    if upload is None:
+        raise InvalidUpload(f"Missing file field '{field}'")
+    upload.finish()
+    return upload, fields
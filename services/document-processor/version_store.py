@@ -0,0 +1,93 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+VERSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+# Versions kept per document; older ones are deleted on save
+MAX_VERSIONS = int(os.getenv("PARSE_STORE_MAX_VERSIONS", "20"))
+
+class VersionNotFound(LookupError):
+    pass
+
+class ParseStore:
+    """Stores parsed document versions on disk for incremental re-parsing.
+
+    A version holds the section fingerprints and chunks of one parse, not
+    the raw file, so it stays small enough to keep for every negotiation
+    round. Files are gzipped JSON named by version id.
+
+    Only the latest ``max_versions`` versions of each document are kept; a
+    per-document list of version ids records the order. Saves for the same
+    document take a file lock, so concurrent parses (in any worker) don't
+    lose list entries or prune each other's versions.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_versions: int = MAX_VERSIONS):
+        self.root = root or os.getenv(
+            "PARSE_STORE_DIR",
+            os.path.join(tempfile.gettempdir(), "deal-velocity-parses")
+        )
+        self.max_versions = max(1, max_versions)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, version_id: str) -> str:
+        if not VERSION_ID_PATTERN.match(version_id):
+            raise ValueError(f"Invalid version id: {version_id}")
+        return os.path.join(self.root, f"{version_id}.json.gz")
+
+    def _versions_path(self, document_id: str) -> str:
+        # Document ids come from callers, so don't use them as file names
+        digest = hashlib.sha256(document_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.root, f"document-{digest}.versions")
+
+    @contextmanager
+    def _document_lock(self, document_id: str):
+        with open(f"{self._versions_path(document_id)}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self, version: Dict[str, Any]) -> None:
+        path = self._path(version["version_id"])
+        with self._document_lock(version["document_id"]):
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(version, f, default=str)
+            os.replace(tmp_path, path)
+            self._prune(version["document_id"], version["version_id"])
+
+    def _prune(self, document_id: str, version_id: str) -> None:
+        # Called with the document lock held
+        versions_path = self._versions_path(document_id)
+        try:
+            with open(versions_path) as f:
+                versions = json.load(f)
+        except (OSError, ValueError):
+            versions = []
+        versions.append(version_id)
+        stale, versions = versions[:-self.max_versions], versions[-self.max_versions:]
+
+        tmp_path = f"{versions_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(versions, f)
+        os.replace(tmp_path, versions_path)
+        for old_version_id in stale:
+            try:
+                os.remove(self._path(old_version_id))
+            except FileNotFoundError:
+                pass
+
+    def load(self, version_id: str) -> Dict[str, Any]:
+        path = self._path(version_id)
+        if not os.path.exists(path):
+            raise VersionNotFound(f"Parsed version '{version_id}' not found")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
@@ -0,0 +1,143 @@
+"""Compare the Pinecone and pgvector backends on the same data and queries.
+
+Loads one synthetic corpus into both backends, runs the same query set
+against each with a pool of concurrent workers, and reports upsert
+throughput, search latency percentiles, and how much the two backends'
+top-k results overlap.
+
+Local run (fake Pinecone, hashing embedder, Postgres with the 005 migration):
+
+    python benchmark_backends.py --dsn postgresql://localhost/dealvelocity \\
+        --pinecone fake --embedder hashing --docs 5000 --queries 500
+
+Against the real services, use --pinecone real --embedder openai; overlap then
+measures agreement between llama-text-embed-v2 and the OpenAI model.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embeddings import HashingEmbedder, OpenAIEmbedder
+from load_test import make_document, make_query, percentile
+from pgvector_store import PgVectorStore
+from vector_store import VectorStore
+
+
+def build_backends(args) -> Dict[str, Any]:
+    if args.pinecone == "fake":
+        from fake_pinecone import FakePinecone
+        pinecone = VectorStore(client=FakePinecone.from_env())
+    else:
+        pinecone = VectorStore()
+
+    embedder = HashingEmbedder() if args.embedder == "hashing" else OpenAIEmbedder()
+    pgvector = PgVectorStore(dsn=args.dsn, embedder=embedder)
+    return {"pinecone": pinecone, "pgvector": pgvector}
+
+
+def load(store, namespace: str, documents: List[Dict[str, Any]]) -> Dict[str, float]:
+    start = time.perf_counter()
+    store.upsert_documents(namespace, documents)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "docs_per_second": len(documents) / elapsed if elapsed else 0.0}
+
+
+def run_queries(store, namespace: str, queries: List[str], top_k: int, concurrency: int,
+                filter: Optional[Dict[str, Any]], rerank: bool) -> Dict[str, Any]:
+    def one(query: str):
+        start = time.perf_counter()
+        results = store.search(namespace, query, top_k=top_k, filter=filter, rerank=rerank)
+        return time.perf_counter() - start, [r["id"] for r in results]
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, queries))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(elapsed for elapsed, _ in outcomes)
+    return {
+        "queries": len(queries),
+        "throughput_qps": len(queries) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "ids": [ids for _, ids in outcomes]
+    }
+
+
+def overlap_at_k(a: List[List[str]], b: List[List[str]], top_k: int) -> float:
+    """Mean fraction of shared ids between paired top-k lists."""
+    if not a:
+        return 0.0
+    return sum(len(set(x) & set(y)) / top_k for x, y in zip(a, b)) / len(a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Pinecone vs pgvector on identical workloads")
+    parser.add_argument("--dsn", default=os.getenv("PGVECTOR_DSN") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--pinecone", choices=["fake", "real"], default="fake")
+    parser.add_argument("--embedder", choices=["hashing", "openai"], default="hashing")
+    parser.add_argument("--namespace", default="benchmark")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--filter", type=json.loads, default=None, help='e.g. \'{"outcome": "won"}\'')
+    parser.add_argument("--no-rerank", action="store_true", help="Disable Pinecone reranking")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark namespace afterwards")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or PGVECTOR_DSN is required")
+
+    rng = random.Random(args.seed)
+    documents = []
+    for i in range(args.docs):
+        doc = make_document(rng, f"bench-{i:06d}")
+        documents.append({"_id": doc["id"], "content": doc["text"], **doc["metadata"]})
+    queries = [make_query(rng) for _ in range(args.queries)]
+
+    backends = build_backends(args)
+    report: Dict[str, Any] = {}
+    ids: Dict[str, List[List[str]]] = {}
+    try:
+        for name, store in backends.items():
+            store.delete(args.namespace, delete_all=True)
+            report[name] = {"load": load(store, args.namespace, documents)}
+            search = run_queries(store, args.namespace, queries, args.top_k, args.concurrency,
+                                 args.filter, rerank=not args.no_rerank)
+            ids[name] = search.pop("ids")
+            report[name]["search"] = search
+        report["overlap_at_k"] = overlap_at_k(ids["pinecone"], ids["pgvector"], args.top_k)
+    finally:
+        if not args.keep:
+            for store in backends.values():
+                store.delete(args.namespace, delete_all=True)
+        backends["pgvector"].close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    header = f"{'backend':<10}{'load s':>9}{'docs/s':>9}{'qps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name in backends:
+        load_stats, search = report[name]["load"], report[name]["search"]
+        print(
+            f"{name:<10}{load_stats['seconds']:>9.2f}{load_stats['docs_per_second']:>9.0f}"
+            f"{search['throughput_qps']:>9.1f}{search['p50_ms']:>9.1f}{search['p95_ms']:>9.1f}{search['p99_ms']:>9.1f}"
+        )
+    print(f"\noverlap@{args.top_k}: {report['overlap_at_k']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+"""Deal Memory Graph: clauses, deals and outcomes as an in-memory graph.
+
+Vector records are nodes keyed by their ids. Metadata fields on a record
+(``outcome``, ``clause_type``, ``deal_id``, ...) link it to attribute nodes,
+so "which outcomes follow clauses like this one" becomes a short traversal
+from the ANN hits instead of a re-search and re-count per request.
+
+Storage is array-backed to keep millions of edges compact:
+
+- Node ids are interned to ints. Per-node state (kind, liveness,
+  generation) lives in ``array``/``bytearray``.
+- Edges are stored in CSR form: ``offsets`` indexes ``targets``, ``types``,
+  ``weights``. Every edge is stored in both directions, so traversal can
+  walk back from an outcome to its clauses. Reverse entries have
+  ``REVERSE`` set in their type.
+- New edges go to an append-only delta (parallel arrays chained per node).
+  Once it grows past a fraction of the base, a background thread merges it
+  into fresh CSR arrays built from a copy, outside the graph lock.
+- Re-upserting a record bumps its generation, which invalidates the edges
+  derived from its old metadata without touching the arrays. Compaction
+  drops invalidated entries.
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+NODE_KINDS = ("record", "outcome", "clause_type", "deal", "contract", "document")
+
+EDGE_TYPES = {
+    "has_outcome": 1,
+    "has_clause_type": 2,
+    "in_deal": 3,
+    "in_contract": 4,
+    "in_document": 5,
+    "derived_from": 6,
+    "similar_to": 7,
+    "related_to": 8,
+}
+EDGE_NAMES = {code: name for name, code in EDGE_TYPES.items()}
+REVERSE = 0x80
+
+# Metadata field -> (attribute node kind, edge type)
+METADATA_EDGES = {
+    "outcome": ("outcome", "has_outcome"),
+    "deal_outcome": ("outcome", "has_outcome"),
+    "clause_type": ("clause_type", "has_clause_type"),
+    "deal_id": ("deal", "in_deal"),
+    "project_id": ("deal", "in_deal"),
+    "contract_id": ("contract", "in_contract"),
+    "document_id": ("document", "in_document"),
+    "parent_id": ("record", "derived_from"),
+}
+
+# Owner value for explicit edges; their validity is tracked per edge
+EXPLICIT = -1
+COMPACT_MIN_DELTA = int(os.getenv("GRAPH_COMPACT_MIN_DELTA", "50000"))
+COMPACT_RATIO = 0.25
+# Intermediate nodes with more edges than this are not expanded: hubs such
+# as a clause type link to most of the namespace and carry little signal
+MAX_EXPAND_DEGREE = int(os.getenv("GRAPH_MAX_EXPAND_DEGREE", "1000"))
+# Each hop after the first scales the path weight, so a clause's own outcome
+# outranks one reached through its deal's other clauses
+HOP_DECAY = float(os.getenv("GRAPH_HOP_DECAY", "0.5"))
+# Snapshot a namespace after this many writes, or once unsaved writes are
+# this many seconds old
+SNAPSHOT_EVERY = int(os.getenv("GRAPH_SNAPSHOT_EVERY", "10000"))
+SNAPSHOT_INTERVAL = float(os.getenv("GRAPH_SNAPSHOT_INTERVAL", "300"))
+SNAPSHOT_MAGIC = b"DVGRAPH1"
+
+def node_key(kind: str, value: Any) -> str:
+    return f"{kind}:{value}"
+
+def edge_code(edge_type: str) -> int:
+    if edge_type not in EDGE_TYPES:
+        raise ValueError(f"Unknown edge type '{edge_type}'; expected one of {sorted(EDGE_TYPES)}")
+    return EDGE_TYPES[edge_type]
+
+def kind_code(kind: str) -> int:
+    if kind not in NODE_KINDS:
+        raise ValueError(f"Unknown node kind '{kind}'; expected one of {list(NODE_KINDS)}")
+    return NODE_KINDS.index(kind)
+
+class DealGraph:
+    """Typed, weighted graph for one namespace."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Serialises compactions; taken before ``lock``, never while holding it
+        self.compact_lock = threading.RLock()
+        self.compacting = False
+        self.keys: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.kinds = array("B")
+        self.alive = bytearray()
+        self.gen = array("I")
+        # Current version of each explicit edge, keyed (src, dst, type)
+        self.explicit: Dict[Tuple[int, int, int], int] = {}
+
+        # CSR base
+        self.offsets = array("q", [0])
+        self.targets = array("i")
+        self.types = array("B")
+        self.weights = array("f")
+        self.owners = array("i")
+        self.gens = array("I")
+
+        # Delta, chained per source node through d_next/d_head
+        self.d_sources = array("i")
+        self.d_targets = array("i")
+        self.d_types = array("B")
+        self.d_weights = array("f")
+        self.d_owners = array("i")
+        self.d_gens = array("I")
+        self.d_next = array("i")
+        self.d_head = array("i")
+        self.d_count = array("i")
+
+    # -- nodes ---------------------------------------------------------------
+
+    def _intern(self, kind: str, value: Any) -> int:
+        key = node_key(kind, value)
+        node = self.index.get(key)
+        if node is None:
+            node = len(self.keys)
+            self.keys.append(key)
+            self.index[key] = node
+            self.kinds.append(kind_code(kind))
+            self.alive.append(1)
+            self.gen.append(0)
+            self.d_head.append(-1)
+            self.d_count.append(0)
+        return node
+
+    def node(self, kind: str, value: Any) -> Optional[int]:
+        return self.index.get(node_key(kind, value))
+
+    def describe(self, node: int) -> Dict[str, Any]:
+        kind = NODE_KINDS[self.kinds[node]]
+        return {"node_id": self.keys[node], "kind": kind, "value": self.keys[node][len(kind) + 1:]}
+
+    # -- edges ---------------------------------------------------------------
+
+    def _append(self, src: int, dst: int, edge_type: int, weight: float, owner: int, gen: int):
+        entry = len(self.d_targets)
+        self.d_sources.append(src)
+        self.d_targets.append(dst)
+        self.d_types.append(edge_type)
+        self.d_weights.append(weight)
+        self.d_owners.append(owner)
+        self.d_gens.append(gen)
+        self.d_next.append(self.d_head[src])
+        self.d_head[src] = entry
+        self.d_count[src] += 1
+
+    def _add_pair(self, src: int, dst: int, edge_type: int, weight: float, owner: int, gen: int):
+        self._append(src, dst, edge_type, weight, owner, gen)
+        self._append(dst, src, edge_type | REVERSE, weight, owner, gen)
+
+    def _valid(self, src: int, dst: int, edge_type: int, owner: int, gen: int) -> bool:
+        if not (self.alive[src] and self.alive[dst]):
+            return False
+        if owner == EXPLICIT:
+            key = (dst, src, edge_type & ~REVERSE) if edge_type & REVERSE else (src, dst, edge_type)
+            return self.explicit.get(key) == gen
+        return self.gen[owner] == gen
+
+    def degree(self, node: int) -> int:
+        """Upper bound on the node's edge count (includes invalidated entries)."""
+        base = self.offsets[node + 1] - self.offsets[node] if node + 1 < len(self.offsets) else 0
+        return base + self.d_count[node]
+
+    def neighbors(self, node: int) -> Iterator[Tuple[int, int, float]]:
+        """Yield (neighbor, edge type, weight) for the node's live edges."""
+        if node + 1 < len(self.offsets):
+            for k in range(self.offsets[node], self.offsets[node + 1]):
+                if self._valid(node, self.targets[k], self.types[k], self.owners[k], self.gens[k]):
+                    yield self.targets[k], self.types[k], self.weights[k]
+        k = self.d_head[node]
+        while k != -1:
+            if self._valid(node, self.d_targets[k], self.d_types[k], self.d_owners[k], self.d_gens[k]):
+                yield self.d_targets[k], self.d_types[k], self.d_weights[k]
+            k = self.d_next[k]
+
+    def upsert_record(self, record_id: str, metadata: Dict[str, Any]):
+        """Replace the metadata-derived edges of a record."""
+        with self.lock:
+            record = self._intern("record", record_id)
+            self.gen[record] += 1
+            self.alive[record] = 1
+            gen = self.gen[record]
+
+            deal = None
+            outcomes = []
+            for field, (kind, edge_name) in METADATA_EDGES.items():
+                values = metadata.get(field)
+                if values is None or values == "":
+                    continue
+                for value in values if isinstance(values, list) else [values]:
+                    target = self._intern(kind, value)
+                    self._add_pair(record, target, EDGE_TYPES[edge_name], 1.0, record, gen)
+                    if kind == "deal":
+                        deal = target
+                    elif kind == "outcome":
+                        outcomes.append(target)
+
+            # A clause that knows both its deal and the outcome also records
+            # the deal's outcome, so sibling clauses reach it through the deal
+            if deal is not None:
+                for outcome in outcomes:
+                    self._add_pair(deal, outcome, EDGE_TYPES["has_outcome"], 1.0, record, gen)
+            self._maybe_compact()
+
+    def remove_record(self, record_id: str):
+        with self.lock:
+            record = self.node("record", record_id)
+            if record is not None:
+                self.gen[record] += 1
+                self.alive[record] = 0
+
+    def set_edge(self, src: Tuple[str, Any], dst: Tuple[str, Any], edge_type: str, weight: float = 1.0):
+        """Add or re-weight an explicit edge; weight 0 removes it."""
+        code = edge_code(edge_type)
+        with self.lock:
+            u = self._intern(*src)
+            v = self._intern(*dst)
+            key = (u, v, code)
+            version = self.explicit.get(key, 0) + 1
+            self.explicit[key] = version
+            if weight:
+                self._add_pair(u, v, code, weight, EXPLICIT, version)
+            self._maybe_compact()
+
+    # -- compaction ----------------------------------------------------------
+
+    def _maybe_compact(self):
+        # Called by writers with the lock held, so only start the rebuild here
+        if self.compacting or len(self.d_targets) <= max(COMPACT_MIN_DELTA, COMPACT_RATIO * len(self.targets)):
+            return
+        self.compacting = True
+        threading.Thread(target=self._compact_in_background, name="graph-compact", daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Warning: Could not compact deal graph: {e}")
+        finally:
+            with self.lock:
+                self.compacting = False
+
+    def compact(self, reclaim: bool = False) -> Dict[str, int]:
+        """Merge the delta into the CSR base and drop invalidated entries.
+
+        The new base is built from a copy of the arrays without holding the
+        lock, so queries and writes go on meanwhile; writes made during the
+        build are kept in the delta.
+
+        With ``reclaim``, also drop deleted records and attribute nodes left
+        without edges, renumbering the rest. That holds the lock throughout,
+        and node ids are only stable until the next reclaiming compaction.
+        """
+        with self.compact_lock:
+            if reclaim:
+                with self.lock:
+                    return self._compact_reclaim()
+
+            with self.lock:
+                frozen = self._copy()
+            _, base = frozen._build_base(reclaim=False)
+            with self.lock:
+                self.offsets, self.targets, self.types, self.weights, self.owners, self.gens = base
+                # Re-chain the delta entries written since the copy
+                start = len(frozen.d_targets)
+                tail = [a[start:] for a in (self.d_sources, self.d_targets, self.d_types,
+                                            self.d_weights, self.d_owners, self.d_gens)]
+                self._clear_delta(len(self.keys))
+                for entry in zip(*tail):
+                    self._append(*entry)
+                return {"nodes": len(self.keys), "base_entries": len(self.targets)}
+
+    def _copy(self) -> "DealGraph":
+        """Copy of the state a compaction reads (call with the lock held)."""
+        frozen = DealGraph.__new__(DealGraph)
+        frozen.keys = list(self.keys)
+        frozen.explicit = dict(self.explicit)
+        frozen.alive = bytearray(self.alive)
+        for name in ("kinds", "gen", "offsets", "targets", "types", "weights", "owners", "gens",
+                     "d_targets", "d_types", "d_weights", "d_owners", "d_gens", "d_next", "d_head"):
+            setattr(frozen, name, array(getattr(self, name).typecode, getattr(self, name)))
+        return frozen
+
+    def _build_base(self, reclaim: bool):
+        """CSR arrays holding the live edges, and the old -> new node id map."""
+        n = len(self.keys)
+        rows: List[List[Tuple[int, int, float, int, int]]] = [[] for _ in range(n)]
+        for node in range(n):
+            if node + 1 < len(self.offsets):
+                for k in range(self.offsets[node], self.offsets[node + 1]):
+                    if self._valid(node, self.targets[k], self.types[k], self.owners[k], self.gens[k]):
+                        rows[node].append((self.targets[k], self.types[k], self.weights[k],
+                                           self.owners[k], self.gens[k]))
+            k = self.d_head[node]
+            while k != -1:
+                if self._valid(node, self.d_targets[k], self.d_types[k], self.d_owners[k], self.d_gens[k]):
+                    rows[node].append((self.d_targets[k], self.d_types[k], self.d_weights[k],
+                                       self.d_owners[k], self.d_gens[k]))
+                k = self.d_next[k]
+
+        # Node ids to keep, in order; dropped nodes map to -1
+        remap = array("i", range(n))
+        if reclaim:
+            kept = 0
+            for node in range(n):
+                if self.alive[node] and (rows[node] or self.kinds[node] == 0):
+                    remap[node] = kept
+                    kept += 1
+                else:
+                    remap[node] = -1
+
+        offsets = array("q", [0])
+        targets, types, weights = array("i"), array("B"), array("f")
+        owners, gens = array("i"), array("I")
+        for node, row in enumerate(rows):
+            if remap[node] == -1:
+                continue
+            for target, edge_type, weight, owner, gen in row:
+                targets.append(remap[target])
+                types.append(edge_type)
+                weights.append(weight)
+                owners.append(owner if owner == EXPLICIT else remap[owner])
+                gens.append(gen)
+            offsets.append(len(targets))
+        return remap, (offsets, targets, types, weights, owners, gens)
+
+    def _compact_reclaim(self) -> Dict[str, int]:
+        remap, base = self._build_base(reclaim=True)
+        explicit = {}
+        for (u, v, t), version in self.explicit.items():
+            if self.alive[u] and self.alive[v] and remap[u] != -1 and remap[v] != -1:
+                explicit[(remap[u], remap[v], t)] = version
+
+        keep = [node for node in range(len(self.keys)) if remap[node] != -1]
+        self.keys = [self.keys[node] for node in keep]
+        self.index = {key: node for node, key in enumerate(self.keys)}
+        self.kinds = array("B", (self.kinds[node] for node in keep))
+        self.alive = bytearray(b"\x01" * len(keep))
+        self.gen = array("I", (self.gen[node] for node in keep))
+
+        self.offsets, self.targets, self.types, self.weights, self.owners, self.gens = base
+        self.explicit = explicit
+        self._clear_delta(len(keep))
+        return {"nodes": len(keep), "base_entries": len(self.targets)}
+
+    def _clear_delta(self, n: int):
+        self.d_sources, self.d_targets = array("i"), array("i")
+        self.d_types, self.d_weights = array("B"), array("f")
+        self.d_owners, self.d_gens, self.d_next = array("i"), array("I"), array("i")
+        self.d_head = array("i", [-1]) * n
+        self.d_count = array("i", [0]) * n
+
+    # -- queries -------------------------------------------------------------
+
+    def reachable(
+        self,
+        start: int,
+        max_depth: int = 2,
+        edge_types: Optional[List[str]] = None,
+        target_kind: Optional[str] = None
+    ) -> Dict[int, float]:
+        """Best path weight from ``start`` to every node within ``max_depth`` hops.
+
+        Path weight is the product of edge weights, times ``HOP_DECAY`` for
+        every hop after the first. Nodes of ``target_kind`` and nodes above
+        ``MAX_EXPAND_DEGREE`` are reported but not expanded further.
+        """
+        allowed = {edge_code(t) for t in edge_types} if edge_types else None
+        target_code = kind_code(target_kind) if target_kind else None
+        best = {start: 1.0}
+        frontier = {start: 1.0}
+        with self.lock:
+            for depth in range(max_depth):
+                decay = HOP_DECAY if depth else 1.0
+                next_frontier: Dict[int, float] = {}
+                for node, score in frontier.items():
+                    if node != start and (self.kinds[node] == target_code
+                                          or self.degree(node) > MAX_EXPAND_DEGREE):
+                        continue
+                    for neighbor, edge_type, weight in self.neighbors(node):
+                        if allowed is not None and edge_type & ~REVERSE not in allowed:
+                            continue
+                        path = score * weight * decay
+                        if path > best.get(neighbor, 0.0):
+                            best[neighbor] = path
+                            next_frontier[neighbor] = path
+                frontier = next_frontier
+        del best[start]
+        return best
+
+    def linked(
+        self,
+        hits: List[Dict[str, Any]],
+        target_kind: str = "outcome",
+        max_depth: int = 2,
+        edge_types: Optional[List[str]] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Aggregate the nodes of ``target_kind`` reachable from search hits.
+
+        Each hit contributes its search score times the best path weight to
+        every target it reaches.
+
+        Args:
+            hits: Search results with ``id`` and ``score``
+            target_kind: Node kind to collect, e.g. "outcome" or "deal"
+            max_depth: Maximum hops from each hit
+            edge_types: Edge types to follow (default: all)
+            limit: Number of targets to return
+
+        Returns:
+            Targets sorted by score, each with the ids of the hits that reach it
+        """
+        target_code = kind_code(target_kind)
+        totals: Dict[int, Dict[str, Any]] = {}
+        for hit in hits:
+            start = self.node("record", hit["id"])
+            if start is None:
+                continue
+            for node, path_weight in self.reachable(start, max_depth, edge_types, target_kind).items():
+                if self.kinds[node] != target_code:
+                    continue
+                entry = totals.setdefault(node, {**self.describe(node), "score": 0.0, "support": 0, "records": []})
+                entry["score"] += hit["score"] * path_weight
+                entry["support"] += 1
+                entry["records"].append(hit["id"])
+
+        return sorted(totals.values(), key=lambda e: e["score"], reverse=True)[:limit]
+
+    def record_ids(self) -> List[str]:
+        """Ids of the records currently in the graph."""
+        prefix = "record:"
+        with self.lock:
+            return [self.keys[node][len(prefix):] for node, alive in enumerate(self.alive)
+                    if alive and self.kinds[node] == 0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            arrays = [self.kinds, self.gen, self.offsets, self.targets, self.types, self.weights,
+                      self.owners, self.gens, self.d_sources, self.d_targets, self.d_types, self.d_weights,
+                      self.d_owners, self.d_gens, self.d_next, self.d_head, self.d_count]
+            return {
+                "nodes": len(self.keys),
+                "live_records": sum(1 for node, alive in enumerate(self.alive)
+                                    if alive and self.kinds[node] == 0),
+                "base_entries": len(self.targets),
+                "delta_entries": len(self.d_targets),
+                "array_bytes": sum(a.itemsize * len(a) for a in arrays) + len(self.alive)
+            }
+
+    # -- snapshots -----------------------------------------------------------
+
+    _SNAPSHOT_ARRAYS = ("kinds", "gen", "offsets", "targets", "types", "weights", "owners", "gens")
+
+    def save(self, path: str):
+        """Compact and write an atomic snapshot: JSON header + raw arrays."""
+        with self.compact_lock, self.lock:
+            self.compact()
+            header = json.dumps({
+                "byteorder": sys.byteorder,
+                "keys": self.keys,
+                "alive": list(self.alive),
+                "explicit": [[u, v, t, version] for (u, v, t), version in self.explicit.items()],
+                "arrays": {name: len(getattr(self, name)) for name in self._SNAPSHOT_ARRAYS}
+            }).encode("utf-8")
+
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(SNAPSHOT_MAGIC)
+                    f.write(struct.pack("<Q", len(header)))
+                    f.write(header)
+                    for name in self._SNAPSHOT_ARRAYS:
+                        getattr(self, name).tofile(f)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    @classmethod
+    def load(cls, path: str) -> "DealGraph":
+        graph = cls()
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a graph snapshot")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+            for name in cls._SNAPSHOT_ARRAYS:
+                values = array(getattr(graph, name).typecode)
+                values.fromfile(f, header["arrays"][name])
+                if header["byteorder"] != sys.byteorder:
+                    values.byteswap()
+                setattr(graph, name, values)
+
+        graph.keys = header["keys"]
+        graph.index = {key: node for node, key in enumerate(graph.keys)}
+        graph.alive = bytearray(header["alive"])
+        graph.explicit = {(u, v, t): version for u, v, t, version in header["explicit"]}
+        graph._clear_delta(len(graph.keys))
+        return graph
+
+class DealGraphStore:
+    """One ``DealGraph`` per namespace, loaded from snapshots on first use.
+
+    With a snapshot directory, a namespace is saved in the background after
+    ``SNAPSHOT_EVERY`` writes, or on the first write once unsaved changes
+    are ``SNAPSHOT_INTERVAL`` seconds old.
+    """
+
+    def __init__(self, snapshot_dir: Optional[str] = None):
+        self.snapshot_dir = snapshot_dir
+        self.graphs: Dict[str, DealGraph] = {}
+        self.lock = threading.Lock()
+        # namespace -> [unsaved writes, time of the first unsaved write]
+        self.pending: Dict[str, List[float]] = {}
+        self.saving: set = set()
+
+    def _path(self, namespace: str) -> str:
+        # The readable prefix is lossy ("a/b" and "a_b" agree), the hash is not
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in namespace)[:64]
+        digest = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"{safe}-{digest}.graph")
+
+    def has_snapshot(self, namespace: str) -> bool:
+        return bool(self.snapshot_dir) and os.path.exists(self._path(namespace))
+
+    def get(self, namespace: str) -> DealGraph:
+        with self.lock:
+            graph = self.graphs.get(namespace)
+            if graph is None:
+                path = self._path(namespace) if self.snapshot_dir else None
+                graph = DealGraph.load(path) if path and os.path.exists(path) else DealGraph()
+                self.graphs[namespace] = graph
+            return graph
+
+    def upsert_documents(self, namespace: str, documents: List[Dict[str, Any]]):
+        """Update graphs from documents in Pinecone upsert format."""
+        graph = self.get(namespace)
+        for document in documents:
+            graph.upsert_record(document["_id"], document)
+        self.note_writes(namespace, len(documents))
+
+    def note_writes(self, namespace: str, count: int):
+        """Count writes to a namespace and start a snapshot when one is due."""
+        if not self.snapshot_dir or not count:
+            return
+        now = time.time()
+        with self.lock:
+            pending = self.pending.setdefault(namespace, [0, now])
+            pending[0] += count
+            due = pending[0] >= SNAPSHOT_EVERY or now - pending[1] >= SNAPSHOT_INTERVAL
+            if not due or namespace in self.saving:
+                return
+            self.saving.add(namespace)
+        threading.Thread(target=self._save_in_background, args=(namespace,),
+                         name="graph-snapshot", daemon=True).start()
+
+    def _save_in_background(self, namespace: str):
+        try:
+            self.save(namespace)
+        except Exception as e:
+            print(f"Warning: Could not snapshot deal graph '{namespace}': {e}")
+        finally:
+            with self.lock:
+                self.saving.discard(namespace)
+
+    def save(self, namespace: Optional[str] = None) -> List[str]:
+        """Snapshot one namespace (or all loaded ones); returns the paths written."""
+        if not self.snapshot_dir:
+            raise ValueError("GRAPH_SNAPSHOT_DIR is not set")
+        namespaces = [namespace] if namespace else list(self.graphs)
+        paths = []
+        for ns in namespaces:
+            path = self._path(ns)
+            with self.lock:
+                # Writes that land during the save count towards the next one
+                self.pending.pop(ns, None)
+            self.get(ns).save(path)
+            paths.append(path)
+        return paths
@@ -0,0 +1,79 @@
+"""Client-side embedders for backends without integrated embeddings.
+
+Pinecone embeds text inside the index; pgvector stores whatever vectors it
+is given. Any object with ``dimension`` and ``embed(texts)`` works.
+"""
+import hashlib
+import math
+import os
+import re
+from typing import List, Optional
+
+from common.instrumentation import stage
+
+# Matches documents.embedding vector(1536) in schema.sql
+DEFAULT_DIMENSION = 1536
+
+class OpenAIEmbedder:
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        dimension: int = DEFAULT_DIMENSION,
+        api_key: Optional[str] = None,
+        batch_size: int = 256
+    ):
+        from openai import OpenAI
+
+        self.model = model
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            with stage("openai.embed", texts=len(batch)):
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=batch,
+                    dimensions=self.dimension
+                )
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+        return vectors
+
+class HashingEmbedder:
+    """Bag-of-words feature hashing; no model or network needed.
+
+    Scores match the fake Pinecone client's word-overlap cosine, which makes
+    it the embedder for local tests and backend benchmarks. Not for
+    production relevance.
+    """
+
+    def __init__(self, dimension: int = DEFAULT_DIMENSION):
+        self.dimension = dimension
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimension
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+def embedder_from_env():
+    """Pick an embedder from EMBEDDER (openai or hashing)."""
+    kind = os.getenv("EMBEDDER", "openai").lower()
+    dimension = int(os.getenv("EMBEDDING_DIMENSION", str(DEFAULT_DIMENSION)))
+    if kind == "hashing":
+        return HashingEmbedder(dimension)
+    if kind == "openai":
+        return OpenAIEmbedder(
+            model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+            dimension=dimension
+        )
+    raise ValueError(f"Unknown EMBEDDER '{kind}'; expected openai or hashing")
@@ -0,0 +1,281 @@
+"""In-process stand-in for the Pinecone client.
+
+Implements the subset of the SDK surface that ``VectorStore`` uses
+(``has_index``, ``Index``, ``upsert_records``, ``search``, ``fetch``,
+``list``, ``delete`` and ``describe_index_stats``) so the service can be
+run and load-tested without a Pinecone account. Scores come from a hashed
+bag-of-words cosine similarity, which is enough to exercise the request
+path but says nothing about retrieval quality.
+
+Latency, jitter, rate limits and error injection are configurable to
+approximate a remote index under load.
+"""
+import bisect
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Union
+
+from metadata_filter import matches_filter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class FakePineconeError(Exception):
+    """Raised for injected failures and rate-limit rejections."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"({status}) {reason}")
+        self.status = status
+        self.reason = reason
+
+
+def _term_vector(text: str) -> Dict[str, float]:
+    counts = Counter(TOKEN_PATTERN.findall(text.lower()))
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {term: c / norm for term, c in counts.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(term, 0.0) for term, weight in a.items())
+
+
+class _RateLimiter:
+    """Token bucket allowing ``rate`` operations per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        # Hold at least one token, or rates below 1/s would never allow a call
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class FakeIndex:
+    def __init__(self, name: str, client: "FakePinecone"):
+        self.name = name
+        self.client = client
+        self.namespaces: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.vectors: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.lock = threading.Lock()
+
+    def upsert_records(self, namespace: str, records: List[Dict[str, Any]]):
+        self.client._simulate("upsert_records", len(records))
+        with self.lock:
+            ns = self.namespaces.setdefault(namespace, {})
+            vectors = self.vectors.setdefault(namespace, {})
+            for record in records:
+                record_id = record.get("_id") or record.get("id")
+                if not record_id:
+                    raise FakePineconeError(400, "Record is missing '_id'")
+                fields = {k: v for k, v in record.items() if k not in ("_id", "id")}
+                for key, value in fields.items():
+                    if isinstance(value, dict):
+                        raise FakePineconeError(400, f"Nested metadata is not allowed: '{key}'")
+                ns[record_id] = fields
+                vectors[record_id] = _term_vector(str(fields.get("content", "")))
+        return None
+
+    def search(
+        self,
+        namespace: str,
+        query: Dict[str, Any],
+        rerank: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ):
+        self.client._simulate("search")
+        query_vector = _term_vector(query.get("inputs", {}).get("text", ""))
+        top_k = query.get("top_k", 10)
+        filter = query.get("filter")
+
+        with self.lock:
+            records = list(self.namespaces.get(namespace, {}).items())
+            vectors = self.vectors.get(namespace, {})
+            scored = [
+                (record_id, _cosine(query_vector, vectors[record_id]), fields)
+                for record_id, fields in records
+                if matches_filter(fields, filter)
+            ]
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        scored = scored[:top_k]
+        if rerank:
+            scored = scored[:rerank.get("top_n", top_k)]
+
+        hits = [
+            {"_id": record_id, "_score": score, "fields": dict(fields)}
+            for record_id, score, fields in scored
+        ]
+        return SimpleNamespace(result=SimpleNamespace(hits=hits))
+
+    def fetch(self, namespace: str, ids: List[str]):
+        self.client._simulate("fetch")
+        with self.lock:
+            ns = self.namespaces.get(namespace, {})
+            records = {
+                record_id: SimpleNamespace(id=record_id, fields=dict(ns[record_id]))
+                for record_id in ids
+                if record_id in ns
+            }
+        return SimpleNamespace(records=records, namespace=namespace)
+
+    def list(
+        self,
+        namespace: str,
+        prefix: Optional[str] = None,
+        limit: int = 100,
+        pagination_token: Optional[str] = None
+    ):
+        self.client._simulate("list")
+        with self.lock:
+            ids = sorted(
+                record_id for record_id in self.namespaces.get(namespace, {})
+                if not prefix or record_id.startswith(prefix)
+            )
+
+        # Like Pinecone's, the token is a cursor (the last id returned), so
+        # deleting already-listed records doesn't make pagination skip any
+        start = bisect.bisect_right(ids, pagination_token) if pagination_token else 0
+        page = ids[start:start + limit]
+        pagination = None
+        if start + limit < len(ids):
+            pagination = SimpleNamespace(next=page[-1])
+
+        return SimpleNamespace(
+            records=[SimpleNamespace(id=record_id) for record_id in page],
+            pagination=pagination,
+            namespace=namespace
+        )
+
+    def delete(
+        self,
+        namespace: str,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        **kwargs
+    ):
+        self.client._simulate("delete")
+        with self.lock:
+            if delete_all:
+                self.namespaces.pop(namespace, None)
+                self.vectors.pop(namespace, None)
+                return {}
+            ns = self.namespaces.get(namespace, {})
+            vectors = self.vectors.get(namespace, {})
+            for record_id in ids or []:
+                ns.pop(record_id, None)
+                vectors.pop(record_id, None)
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        self.client._simulate("describe_index_stats")
+        with self.lock:
+            namespaces = {
+                name: SimpleNamespace(vector_count=len(records))
+                for name, records in self.namespaces.items()
+                if records
+            }
+        return SimpleNamespace(
+            total_vector_count=sum(ns.vector_count for ns in namespaces.values()),
+            namespaces=namespaces,
+            dimension=1024
+        )
+
+
+class FakePinecone:
+    """Drop-in replacement for ``pinecone.Pinecone``.
+
+    Args:
+        latency_ms: Base latency per call, either a number or a dict keyed
+            by operation name (``"search"``, ``"upsert_records"``, ...) with
+            an optional ``"default"`` entry
+        jitter_ms: Uniform random jitter added on top of the base latency
+        per_record_ms: Extra latency per record on upserts
+        rate_limit: Maximum operations per second across all indexes;
+            excess calls fail with a 429 like the real API
+        error_rate: Probability (0-1) that a call fails with a 500
+        seed: Seed for jitter and error injection, for repeatable runs
+    """
+
+    def __init__(
+        self,
+        latency_ms: Union[float, Dict[str, float]] = 0.0,
+        jitter_ms: float = 0.0,
+        per_record_ms: float = 0.0,
+        rate_limit: Optional[float] = None,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        **kwargs
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_record_ms = per_record_ms
+        self.error_rate = error_rate
+        self.limiter = _RateLimiter(rate_limit) if rate_limit else None
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.indexes: Dict[str, FakeIndex] = {}
+        self.indexes_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakePinecone":
+        """Build a client from ``FAKE_PINECONE_*`` environment variables."""
+        rate_limit = os.getenv("FAKE_PINECONE_RATE_LIMIT")
+        seed = os.getenv("FAKE_PINECONE_SEED")
+        return cls(
+            latency_ms=float(os.getenv("FAKE_PINECONE_LATENCY_MS", "0")),
+            jitter_ms=float(os.getenv("FAKE_PINECONE_JITTER_MS", "0")),
+            per_record_ms=float(os.getenv("FAKE_PINECONE_PER_RECORD_MS", "0")),
+            rate_limit=float(rate_limit) if rate_limit else None,
+            error_rate=float(os.getenv("FAKE_PINECONE_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None
+        )
+
+    def has_index(self, name: str) -> bool:
+        # Indexes are created on first use
+        return True
+
+    def Index(self, name: str) -> FakeIndex:
+        with self.indexes_lock:
+            if name not in self.indexes:
+                self.indexes[name] = FakeIndex(name, self)
+            return self.indexes[name]
+
+    def _simulate(self, operation: str, records: int = 0):
+        """Apply rate limiting, error injection and latency for one call."""
+        if self.limiter and not self.limiter.acquire():
+            raise FakePineconeError(429, "Too Many Requests")
+
+        with self.random_lock:
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            jitter = self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+
+        if isinstance(self.latency_ms, dict):
+            base = self.latency_ms.get(operation, self.latency_ms.get("default", 0.0))
+        else:
+            base = self.latency_ms
+
+        delay_ms = base + jitter + self.per_record_ms * records
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+        if fail:
+            raise FakePineconeError(500, f"Injected failure in {operation}")
@@ -0,0 +1,214 @@
+"""Concurrent load generator for the vector store API.
+
+Seeds a namespace with synthetic clause documents, then drives /upsert,
+/search, /similar and /patterns with a pool of concurrent workers and
+reports latency percentiles and throughput per endpoint.
+
+Run the service against the local Pinecone stand-in for repeatable numbers:
+
+    PINECONE_FAKE=1 FAKE_PINECONE_LATENCY_MS=40 FAKE_PINECONE_JITTER_MS=20 \\
+        uvicorn main:app --port 8001 --workers 1
+    python load_test.py --concurrency 16 --requests 500
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import requests
+
+ENDPOINTS = ["upsert", "search", "similar", "patterns"]
+
+CLAUSE_TYPES = ["indemnification", "limitation of liability", "termination",
+                "payment terms", "confidentiality", "warranty", "governing law"]
+TERMS = ["contractor", "government", "agency", "net 30", "net 60", "cap", "fees",
+         "cloud", "infrastructure", "software", "services", "notice", "breach",
+         "damages", "insurance", "audit", "data", "security", "renewal", "FAR"]
+OUTCOMES = ["won", "lost", "pending"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def make_document(rng: random.Random, doc_id: str) -> Dict[str, Any]:
+    clause_type = rng.choice(CLAUSE_TYPES)
+    words = " ".join(rng.choice(TERMS) for _ in range(rng.randint(20, 80)))
+    return {
+        "id": doc_id,
+        "text": f"{clause_type} clause: {words}",
+        "metadata": {
+            "clause_type": clause_type,
+            "outcome": rng.choice(OUTCOMES),
+            "value": rng.randint(10, 5000) * 1000
+        }
+    }
+
+
+def make_query(rng: random.Random) -> str:
+    return f"{rng.choice(CLAUSE_TYPES)} {rng.choice(TERMS)} {rng.choice(TERMS)}"
+
+
+class Workload:
+    def __init__(self, base_url: str, namespace: str, doc_ids: List[str], seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.namespace = namespace
+        self.doc_ids = doc_ids
+        self.seed = seed
+        self.local = threading.local()
+        self.counter = 0
+        self.counter_lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+            with self.counter_lock:
+                self.counter += 1
+                self.local.rng = random.Random(self.seed + self.counter)
+        return self.local.session
+
+    def upsert(self) -> requests.Response:
+        session = self._session()
+        rng = self.local.rng
+        docs = [make_document(rng, f"load-{rng.getrandbits(48):012x}") for _ in range(10)]
+        return session.post(
+            f"{self.base_url}/upsert",
+            json={"documents": docs, "namespace": self.namespace}
+        )
+
+    def search(self) -> requests.Response:
+        session = self._session()
+        return session.post(
+            f"{self.base_url}/search",
+            json={"query": make_query(self.local.rng), "top_k": 10, "namespace": self.namespace}
+        )
+
+    def similar(self) -> requests.Response:
+        session = self._session()
+        doc_id = self.local.rng.choice(self.doc_ids)
+        return session.get(
+            f"{self.base_url}/similar/{doc_id}",
+            params={"top_k": 10, "namespace": self.namespace}
+        )
+
+    def patterns(self) -> requests.Response:
+        session = self._session()
+        return session.post(
+            f"{self.base_url}/patterns",
+            json={"query": make_query(self.local.rng), "top_k": 25, "namespace": self.namespace}
+        )
+
+
+def seed_namespace(base_url: str, namespace: str, count: int, seed: int) -> List[str]:
+    """Upsert ``count`` synthetic documents and return their ids."""
+    rng = random.Random(seed)
+    docs = [make_document(rng, f"seed-{i:06d}") for i in range(count)]
+    for i in range(0, len(docs), 96):
+        response = requests.post(
+            f"{base_url}/upsert",
+            json={"documents": docs[i:i + 96], "namespace": namespace}
+        )
+        response.raise_for_status()
+    return [doc["id"] for doc in docs]
+
+
+def run_endpoint(call: Callable[[], requests.Response], total: int, concurrency: int) -> Dict[str, Any]:
+    """Issue ``total`` calls across ``concurrency`` workers and summarize them."""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+
+            start = time.perf_counter()
+            try:
+                response = call()
+                status = str(response.status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                latencies.append(elapsed)
+                if status != "200":
+                    errors[status] = errors.get(status, 0) + 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+
+def print_report(report: Dict[str, Dict[str, Any]]):
+    header = f"{'endpoint':<10}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, stats in report.items():
+        print(
+            f"{endpoint:<10}{stats['requests']:>8}{sum(stats['errors'].values()):>8}"
+            f"{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+            f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+        )
+        if stats["errors"]:
+            print(f"{'':<10}status counts: {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the vector store API")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--namespace", default="load-test")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--seed-docs", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    doc_ids = seed_namespace(args.base_url, args.namespace, args.seed_docs, args.seed)
+    workload = Workload(args.base_url, args.namespace, doc_ids, args.seed)
+
+    report = {}
+    for endpoint in endpoints:
+        report[endpoint] = run_endpoint(getattr(workload, endpoint), args.requests, args.concurrency)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
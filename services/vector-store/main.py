@@ -1,26 +1,73 @@
 import os
-from fastapi import FastAPI, HTTPException
-from dotenv import load_dotenv
-from models import (
-    UpsertRequest, UpsertResponse,
-    SearchRequest, SearchResponse, SearchResult,
-    PatternResponse
-)
-from vector_store import VectorStore
-from pattern_extractor import PatternExtractor
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+# Shared modules live in services/common (copied to /app/common in the image)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.startup import StartupReport, prewarm_enabled
+
+startup = StartupReport("vector-store")
+
+with startup.phase("import.framework"):
+    from fastapi import BackgroundTasks, FastAPI, HTTPException, Response
+    from dotenv import load_dotenv
+    from common.instrumentation import instrument_app, stage
+
+# The Pinecone SDK is imported when the first index connection is made
+with startup.phase("import.app"):
+    from models import (
+        UpsertRequest, UpsertResponse,
+        SearchRequest, SearchResponse, SearchResult,
+        PatternResponse,
+        RebalanceRequest, RebalanceStatus,
+        GraphQueryRequest, GraphQueryResponse, GraphNode, GraphEdgeRequest,
+        MaintenanceDeleteRequest, MaintenanceStatus
+    )
+    from vector_store import VectorStore
+    from pattern_extractor import PatternExtractor
+    from deal_graph import DealGraphStore
+    from maintenance import MaintenanceManager
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Deal Velocity Vector Store")
+instrument_app(app, "vector-store")
 
 # Initialize services
-vector_store = VectorStore()
-pattern_extractor = PatternExtractor()
+client = None
+if os.getenv("PINECONE_FAKE", "").lower() in ("1", "true", "yes"):
+    # Local stand-in for development and load testing (see fake_pinecone.py)
+    from fake_pinecone import FakePinecone
+    client = FakePinecone.from_env()
 
-@app.on_event("startup")
-async def startup_event():
-    """Check Pinecone index connection on startup."""
+def make_store(config: Dict[str, Any]):
+    """Build a backend from a shard config, falling back to VECTOR_STORE_BACKEND."""
+    backend = config.get("backend") or os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+    if backend == "pgvector":
+        from pgvector_store import PgVectorStore
+        return PgVectorStore(dsn=config.get("dsn"), table=config.get("table", "documents"))
+    return VectorStore(index_name=config.get("index", "deal-velocity"), client=client)
+
+with startup.phase("init"):
+    shard_map_path = os.getenv("VECTOR_STORE_SHARDS")
+    if shard_map_path:
+        # Spread namespaces over several indexes (see sharding.py)
+        from sharding import ShardMap, ShardedVectorStore
+        vector_store = ShardedVectorStore(
+            ShardMap.load(shard_map_path),
+            lambda shard, config: make_store(config)
+        )
+    else:
+        vector_store = make_store({})
+    pattern_extractor = PatternExtractor()
+    deal_graphs = DealGraphStore(os.getenv("GRAPH_SNAPSHOT_DIR"))
+    maintenance = MaintenanceManager(vector_store, deal_graphs)
+
+def connect_index():
+    """Check the index connection; warms the client before the first request."""
     try:
         stats = vector_store.get_stats()
         print(f"Connected to Pinecone index with {stats['total_vector_count']} vectors")
@@ -28,15 +75,61 @@ async def startup_event():
         print(f"Warning: Could not connect to Pinecone index: {str(e)}")
         print("Create index with: pc index create -n deal-velocity -m cosine -c aws -r us-east-1 --model llama-text-embed-v2 --field_map text=content")
 
+# The connection check runs in the background once the port is bound;
+# PREWARM=0 skips it and connects on the first request instead
+startup.install(app, prewarm={"index": connect_index} if prewarm_enabled(True) else None)
+
+def backfill_graphs():
+    """Rebuild the graph of every namespace that has no snapshot to load."""
+    try:
+        namespaces = vector_store.get_stats()["namespaces"]
+    except Exception as e:
+        print(f"Warning: Could not list namespaces for graph backfill: {str(e)}")
+        return
+    for namespace in namespaces:
+        if not deal_graphs.has_snapshot(namespace):
+            job = maintenance.submit_rebuild_graph(namespace)
+            print(f"Rebuilding deal graph for '{namespace}' (job {job.job_id})")
+
+@app.on_event("startup")
+async def abort_interrupted_rebalances():
+    # Rebalances cut short by a restart can't resume; remove their copies
+    if hasattr(vector_store, "abort_interrupted") and vector_store.rebalances:
+        threading.Thread(target=vector_store.abort_interrupted, name="rebalance-abort", daemon=True).start()
+
+@app.on_event("startup")
+async def start_graph_backfill():
+    # Opt-in: a backfill reads every record of the namespaces it rebuilds.
+    # It needs GRAPH_SNAPSHOT_DIR so rebuilt graphs are saved and later
+    # boots only rebuild namespaces that still have no snapshot.
+    if os.getenv("GRAPH_BACKFILL", "0").lower() not in ("1", "true", "yes"):
+        return
+    if not deal_graphs.snapshot_dir:
+        print("Warning: GRAPH_BACKFILL needs GRAPH_SNAPSHOT_DIR; skipping graph backfill")
+        return
+    threading.Thread(target=backfill_graphs, name="graph-backfill", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Checkpoint maintenance jobs and snapshot the deal graphs."""
+    maintenance.close()
+    if deal_graphs.snapshot_dir:
+        for path in deal_graphs.save():
+            print(f"Saved deal graph snapshot {path}")
+    if hasattr(vector_store, "close"):
+        vector_store.close()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
 @app.post("/upsert", response_model=UpsertResponse)
-async def upsert_documents(request: UpsertRequest):
+def upsert_documents(request: UpsertRequest):
     """Upload documents to Pinecone.
     
     Uses Pinecone's integrated embeddings - no need to generate embeddings manually.
+    Declared sync so FastAPI runs the blocking SDK calls in its threadpool
+    and concurrent ingest batches don't stall the event loop.
     """
     try:
         # Convert documents to Pinecone format
@@ -50,10 +143,14 @@ async def upsert_documents(request: UpsertRequest):
         ]
         
         # Upsert with namespace (required for data isolation)
+        namespace = request.namespace or "default"
         result = vector_store.upsert_documents(
-            namespace=request.namespace or "default",
+            namespace=namespace,
             documents=pinecone_docs
         )
+
+        with stage("graph.update", records=len(pinecone_docs)):
+            deal_graphs.upsert_documents(namespace, pinecone_docs)
         
         return UpsertResponse(upserted=result["upserted"])
     except Exception as e:
@@ -71,20 +168,24 @@ async def search_documents(request: SearchRequest):
             rerank=True  # Always rerank for production
         )
         
-        search_results = [
-            SearchResult(
-                id=r["id"],
-                score=r["score"],
-                metadata=r.get("fields", {})
-            )
-            for r in results
-        ]
-        
-        return SearchResponse(
-            results=search_results,
-            query=request.query,
-            count=len(search_results)
-        )
+        # Serialize here rather than via response_model so the whole cost,
+        # JSON encoding included, shows up in the stage
+        with stage("serialize"):
+            search_results = [
+                SearchResult(
+                    id=r["id"],
+                    score=r["score"],
+                    metadata=r.get("fields", {})
+                )
+                for r in results
+            ]
+            
+            body = SearchResponse(
+                results=search_results,
+                query=request.query,
+                count=len(search_results)
+            ).model_dump_json()
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -153,7 +254,8 @@ async def extract_patterns(request: SearchRequest):
         )
         
         # Extract patterns
-        patterns = pattern_extractor.extract_patterns(results)
+        with stage("pattern_extract"):
+            patterns = pattern_extractor.extract_patterns(results)
         
         return PatternResponse(**patterns)
     except Exception as e:
@@ -167,3 +269,196 @@ async def get_stats():
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def _sharded_store():
+    if not hasattr(vector_store, "shard_map"):
+        raise HTTPException(status_code=400, detail="Sharding is not configured; set VECTOR_STORE_SHARDS")
+    return vector_store
+
+@app.get("/shards")
+async def get_shards():
+    """Get the shard map and rebalance progress."""
+    store = _sharded_store()
+    return {**store.shard_map.to_dict(), "rebalances": store.rebalances}
+
+@app.post("/shards/rebalance", response_model=RebalanceStatus, status_code=202)
+def rebalance_namespace(request: RebalanceRequest, background_tasks: BackgroundTasks):
+    """Move a namespace to new shards without taking it offline.
+
+    Dual-writing starts before this returns; the copy, cutover and cleanup
+    run in the background. Poll GET /shards/rebalance/{namespace}.
+    """
+    store = _sharded_store()
+    assignment = request.assignment if isinstance(request.assignment, str) else [
+        r.model_dump() for r in request.assignment
+    ]
+    try:
+        progress = store.begin_rebalance(request.namespace, assignment)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    background_tasks.add_task(store.run_rebalance, request.namespace)
+    return RebalanceStatus(**progress)
+
+@app.get("/shards/rebalance/{namespace}", response_model=RebalanceStatus)
+async def get_rebalance_status(namespace: str):
+    """Get the progress of a namespace rebalance."""
+    progress = _sharded_store().rebalances.get(namespace)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No rebalance for this namespace")
+    return RebalanceStatus(**progress)
+
+@app.post("/graph/query", response_model=GraphQueryResponse)
+def graph_query(request: GraphQueryRequest):
+    """Find graph nodes linked to records similar to a query.
+
+    Answers questions like "which outcomes follow clauses like this one"
+    in one request: ANN search for the clauses, then a traversal from the
+    hits to nodes of ``target_kind``, weighted by search score.
+    """
+    try:
+        hits = vector_store.search(
+            namespace=request.namespace or "default",
+            query_text=request.query,
+            top_k=request.top_k,
+            filter=request.filter,
+            rerank=True
+        )
+
+        with stage("graph.traverse", hits=len(hits)):
+            linked = deal_graphs.get(request.namespace or "default").linked(
+                hits,
+                target_kind=request.target_kind,
+                max_depth=request.max_depth,
+                edge_types=request.edge_types,
+                limit=request.limit
+            )
+
+        return GraphQueryResponse(
+            query=request.query,
+            hits=len(hits),
+            results=[GraphNode(**node) for node in linked]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/graph/neighbors/{record_id}")
+async def graph_neighbors(
+    record_id: str,
+    namespace: str = "default",
+    depth: int = 1,
+    target_kind: Optional[str] = None
+):
+    """List the nodes within ``depth`` hops of a record."""
+    graph = deal_graphs.get(namespace)
+    start = graph.node("record", record_id)
+    if start is None:
+        raise HTTPException(status_code=404, detail="Record not in graph")
+    try:
+        reachable = graph.reachable(start, max_depth=depth, target_kind=target_kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    neighbors = [
+        {**graph.describe(node), "score": weight}
+        for node, weight in sorted(reachable.items(), key=lambda item: item[1], reverse=True)
+        if target_kind is None or graph.describe(node)["kind"] == target_kind
+    ]
+    return {"record_id": record_id, "count": len(neighbors), "neighbors": neighbors}
+
+@app.post("/graph/edges")
+def add_graph_edges(request: GraphEdgeRequest):
+    """Add, re-weight (or with weight 0, remove) explicit edges."""
+    graph = deal_graphs.get(request.namespace or "default")
+    try:
+        for edge in request.edges:
+            graph.set_edge(
+                (edge.source_kind, edge.source),
+                (edge.target_kind, edge.target),
+                edge.type,
+                edge.weight
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        deal_graphs.note_writes(request.namespace or "default", len(request.edges))
+    return {"updated": len(request.edges)}
+
+@app.get("/graph/stats")
+async def graph_stats(namespace: str = "default"):
+    """Get node and edge counts for a namespace's graph."""
+    return deal_graphs.get(namespace).stats()
+
+@app.post("/graph/snapshot")
+def graph_snapshot(namespace: Optional[str] = None):
+    """Write graph snapshots to GRAPH_SNAPSHOT_DIR."""
+    try:
+        return {"saved": deal_graphs.save(namespace)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/maintenance/delete", response_model=MaintenanceStatus, status_code=202)
+def start_bulk_delete(request: MaintenanceDeleteRequest):
+    """Delete records matching a metadata filter and/or id prefix in the background.
+
+    Ids are streamed page by page rather than listed up front; poll
+    GET /maintenance/jobs/{job_id} for progress. Use ``dry_run`` to count
+    matches first.
+    """
+    try:
+        job = maintenance.submit_delete(
+            namespace=request.namespace,
+            filter=request.filter,
+            prefix=request.prefix,
+            dry_run=request.dry_run,
+            concurrency=request.concurrency,
+            batch_size=request.batch_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return MaintenanceStatus(**job.state)
+
+@app.post("/maintenance/compact", response_model=MaintenanceStatus, status_code=202)
+def start_graph_compaction(namespace: str = "default"):
+    """Compact a namespace's deal graph in the background."""
+    return MaintenanceStatus(**maintenance.submit_compact(namespace).state)
+
+@app.post("/maintenance/graph-rebuild", response_model=MaintenanceStatus, status_code=202)
+def start_graph_rebuild(namespace: str = "default"):
+    """Rebuild a namespace's deal graph from the records in the vector store."""
+    return MaintenanceStatus(**maintenance.submit_rebuild_graph(namespace).state)
+
+@app.get("/maintenance/jobs", response_model=List[MaintenanceStatus])
+async def list_maintenance_jobs():
+    return [MaintenanceStatus(**job.state) for job in maintenance.list()]
+
+@app.get("/maintenance/jobs/{job_id}", response_model=MaintenanceStatus)
+async def get_maintenance_job(job_id: str):
+    job = maintenance.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return MaintenanceStatus(**job.state)
+
+@app.post("/maintenance/jobs/{job_id}/cancel", response_model=MaintenanceStatus)
+def cancel_maintenance_job(job_id: str):
+    """Stop a job after its in-flight pages; it can be resumed later."""
+    if maintenance.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        return MaintenanceStatus(**maintenance.cancel(job_id).state)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/maintenance/jobs/{job_id}/resume", response_model=MaintenanceStatus, status_code=202)
+def resume_maintenance_job(job_id: str):
+    """Restart a cancelled, failed or interrupted job from its checkpoint."""
+    if maintenance.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        return MaintenanceStatus(**maintenance.resume(job_id).state)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
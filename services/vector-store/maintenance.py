@@ -0,0 +1,325 @@
+"""Background maintenance jobs: bulk deletes, graph compaction and rebuilds.
+
+A delete job pages through a namespace's ids (optionally by prefix), fetches
+each page to evaluate a metadata filter when one is given, and deletes the
+matches in batches of at most ``MAX_DELETE_BATCH``. Pages are processed by a
+small worker pool, but the checkpoint only advances past pages that are
+completely done, in order, so a job resumed after a crash or cancel picks
+up from the last checkpoint without skipping records.
+
+A graph rebuild pages through the namespace the same way, re-derives each
+record's graph edges from its stored metadata, then drops graph records
+that are no longer in the index. It backfills graphs for data written
+before the graph existed, or by another process.
+
+Job state is written to ``MAINTENANCE_DIR`` as JSON after every page.
+Jobs that were running when the service stopped come back as
+"interrupted" and can be resumed.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.instrumentation import set_queue_depth, stage
+from metadata_filter import matches_filter
+
+MAX_DELETE_BATCH = 1000  # Pinecone's per-call limit
+# Pages that need a fetch to evaluate the filter stay small
+FILTER_PAGE_SIZE = 100
+PREFIX_PAGE_SIZE = 1000
+MAINTENANCE_WORKERS = int(os.getenv("MAINTENANCE_WORKERS", "2"))
+RESUMABLE_STATES = ("failed", "cancelled", "interrupted")
+
+class MaintenanceJob:
+    def __init__(self, state: Dict[str, Any]):
+        self.state = state
+        self.cancel_requested = threading.Event()
+        self.future = None
+
+    @property
+    def job_id(self) -> str:
+        return self.state["job_id"]
+
+class MaintenanceManager:
+    """Runs maintenance jobs on a thread pool and checkpoints their progress."""
+
+    def __init__(self, vector_store, deal_graphs, state_dir: Optional[str] = None):
+        self.vector_store = vector_store
+        self.deal_graphs = deal_graphs
+        self.state_dir = state_dir or os.getenv(
+            "MAINTENANCE_DIR",
+            os.path.join(tempfile.gettempdir(), "deal-velocity-maintenance")
+        )
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.jobs: Dict[str, MaintenanceJob] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=MAINTENANCE_WORKERS, thread_name_prefix="maintenance")
+        self._load_checkpoints()
+
+    # -- persistence ---------------------------------------------------------
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _checkpoint(self, job: MaintenanceJob):
+        job.state["updated_at"] = time.time()
+        path = self._path(job.job_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job.state, f)
+        os.replace(tmp_path, path)
+
+    def _load_checkpoints(self):
+        for filename in sorted(os.listdir(self.state_dir)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, filename)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Skipping unreadable maintenance checkpoint {filename}: {e}")
+                continue
+            job = MaintenanceJob(state)
+            if state["state"] in ("queued", "running"):
+                state["state"] = "interrupted"
+                self._checkpoint(job)
+            self.jobs[job.job_id] = job
+
+    # -- job control ---------------------------------------------------------
+
+    def _new_job(self, kind: str, namespace: str, **spec) -> MaintenanceJob:
+        now = time.time()
+        job = MaintenanceJob({
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "namespace": namespace,
+            "state": "queued",
+            "scanned": 0,
+            "matched": 0,
+            "deleted": 0,
+            "pages": 0,
+            "cursor": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+            "error": None,
+            **spec
+        })
+        with self.lock:
+            self.jobs[job.job_id] = job
+        self._start(job)
+        return job
+
+    def _start(self, job: MaintenanceJob):
+        job.cancel_requested.clear()
+        job.state["state"] = "queued"
+        job.state["error"] = None
+        self._checkpoint(job)
+        job.future = self.executor.submit(self._run, job)
+
+    def submit_delete(
+        self,
+        namespace: str,
+        filter: Optional[Dict[str, Any]] = None,
+        prefix: Optional[str] = None,
+        dry_run: bool = False,
+        concurrency: int = 4,
+        batch_size: int = MAX_DELETE_BATCH
+    ) -> MaintenanceJob:
+        """Start deleting every record in the namespace that matches.
+
+        Args:
+            namespace: Namespace to clean up
+            filter: Pinecone-style metadata filter (see metadata_filter.py)
+            prefix: Only consider ids starting with this prefix
+            dry_run: Count matches without deleting
+            concurrency: Pages processed in parallel
+            batch_size: Ids per delete call, capped at ``MAX_DELETE_BATCH``
+        """
+        if not namespace:
+            raise ValueError("Namespace is required")
+        if not filter and not prefix:
+            raise ValueError("Provide a filter or an id prefix; use delete_all to clear a namespace")
+        return self._new_job(
+            "delete",
+            namespace,
+            filter=filter,
+            prefix=prefix,
+            dry_run=dry_run,
+            concurrency=max(1, concurrency),
+            batch_size=max(1, min(batch_size, MAX_DELETE_BATCH))
+        )
+
+    def submit_compact(self, namespace: str) -> MaintenanceJob:
+        """Start compacting a namespace's deal graph."""
+        return self._new_job("compact_graph", namespace)
+
+    def submit_rebuild_graph(self, namespace: str) -> MaintenanceJob:
+        """Start rebuilding a namespace's deal graph from the vector store."""
+        return self._new_job("rebuild_graph", namespace)
+
+    def get(self, job_id: str) -> Optional[MaintenanceJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[MaintenanceJob]:
+        return sorted(self.jobs.values(), key=lambda job: job.state["created_at"], reverse=True)
+
+    def cancel(self, job_id: str) -> MaintenanceJob:
+        job = self.jobs[job_id]
+        if job.state["state"] not in ("queued", "running"):
+            raise ValueError(f"Job is {job.state['state']}, not running")
+        job.cancel_requested.set()
+        return job
+
+    def resume(self, job_id: str) -> MaintenanceJob:
+        job = self.jobs[job_id]
+        if job.state["state"] not in RESUMABLE_STATES:
+            raise ValueError(f"Job is {job.state['state']}; only {', '.join(RESUMABLE_STATES)} jobs can be resumed")
+        self._start(job)
+        return job
+
+    def close(self):
+        """Stop running jobs at their next checkpoint, leaving them resumable."""
+        for job in self.jobs.values():
+            if job.state["state"] in ("queued", "running"):
+                job.state["interrupting"] = True
+                job.cancel_requested.set()
+        self.executor.shutdown(wait=True)
+
+    # -- execution -----------------------------------------------------------
+
+    def _run(self, job: MaintenanceJob):
+        state = job.state
+        if job.cancel_requested.is_set():
+            self._finish(job, "interrupted" if state.pop("interrupting", False) else "cancelled")
+            return
+        state["state"] = "running"
+        self._checkpoint(job)
+        try:
+            with stage(f"maintenance.{state['kind']}", namespace=state["namespace"]):
+                if state["kind"] == "delete":
+                    self._run_delete(job)
+                elif state["kind"] == "rebuild_graph":
+                    self._run_rebuild_graph(job)
+                else:
+                    self._run_compact(job)
+            if job.cancel_requested.is_set():
+                self._finish(job, "interrupted" if state.pop("interrupting", False) else "cancelled")
+            else:
+                self._finish(job, "completed")
+        except Exception as e:
+            state["error"] = str(e)
+            self._finish(job, "failed")
+
+    def _finish(self, job: MaintenanceJob, outcome: str):
+        job.state["state"] = outcome
+        job.state["finished_at"] = time.time()
+        self._checkpoint(job)
+
+    def _run_delete(self, job: MaintenanceJob):
+        state = job.state
+        namespace = state["namespace"]
+        filter = state["filter"]
+        page_size = FILTER_PAGE_SIZE if filter else PREFIX_PAGE_SIZE
+        graph = self.deal_graphs.get(namespace)
+
+        def process(ids: List[str]) -> Tuple[int, int]:
+            matched = ids
+            if filter:
+                records = self.vector_store.fetch(namespace, ids)
+                matched = [record_id for record_id, record in records.items()
+                           if matches_filter(record["fields"], filter)]
+            if matched and not state["dry_run"]:
+                for i in range(0, len(matched), state["batch_size"]):
+                    batch = matched[i:i + state["batch_size"]]
+                    self.vector_store.delete(namespace, ids=batch)
+                    for record_id in batch:
+                        graph.remove_record(record_id)
+                    self.deal_graphs.note_writes(namespace, len(batch))
+            return len(ids), len(matched)
+
+        pending: "deque[Tuple[Optional[str], Any]]" = deque()
+
+        def drain_one():
+            cursor, future = pending.popleft()
+            scanned, matched = future.result()
+            state["scanned"] += scanned
+            state["matched"] += matched
+            if not state["dry_run"]:
+                state["deleted"] += matched
+            state["pages"] += 1
+            state["cursor"] = cursor
+            self._checkpoint(job)
+            set_queue_depth("maintenance.pages", len(pending))
+
+        with ThreadPoolExecutor(max_workers=state["concurrency"]) as pool:
+            try:
+                pages = self.vector_store.iter_id_pages(namespace, prefix=state["prefix"],
+                                                        page_size=page_size, cursor=state["cursor"])
+                for ids, cursor in pages:
+                    if job.cancel_requested.is_set():
+                        break
+                    pending.append((cursor, pool.submit(process, ids)))
+                    if len(pending) >= state["concurrency"]:
+                        drain_one()
+                while pending:
+                    drain_one()
+            finally:
+                # Only left non-empty when a page failed. Pages not started yet
+                # are dropped; running ones finish when the pool shuts down but
+                # aren't counted. The checkpoint only moved past pages drained
+                # above, in order, so a resume re-processes the rest (deleting
+                # an id twice is harmless).
+                for _, future in pending:
+                    future.cancel()
+                set_queue_depth("maintenance.pages", 0)
+
+    def _run_compact(self, job: MaintenanceJob):
+        graph = self.deal_graphs.get(job.state["namespace"])
+        before = graph.stats()
+        after = graph.compact(reclaim=True)
+        job.state["scanned"] = before["nodes"]
+        job.state["deleted"] = before["nodes"] - after["nodes"]
+        if self.deal_graphs.snapshot_dir:
+            self.deal_graphs.save(job.state["namespace"])
+
+    def _run_rebuild_graph(self, job: MaintenanceJob):
+        state = job.state
+        namespace = state["namespace"]
+        graph = self.deal_graphs.get(namespace)
+        # The set of ids seen isn't checkpointed, so a resumed rebuild starts over
+        state.update(cursor=None, scanned=0, matched=0, deleted=0, pages=0)
+        seen = set()
+
+        pages = self.vector_store.iter_id_pages(namespace, page_size=FILTER_PAGE_SIZE)
+        for ids, cursor in pages:
+            if job.cancel_requested.is_set():
+                return
+            records = self.vector_store.fetch(namespace, ids)
+            for record_id, record in records.items():
+                graph.upsert_record(record_id, record["fields"])
+            seen.update(ids)
+            state["scanned"] += len(ids)
+            state["matched"] += len(records)
+            state["pages"] += 1
+            state["cursor"] = cursor
+            self._checkpoint(job)
+
+        # Records written after their page was scanned are not in ``seen``,
+        # so check the index before dropping anything
+        stale = [record_id for record_id in graph.record_ids() if record_id not in seen]
+        for i in range(0, len(stale), FILTER_PAGE_SIZE):
+            batch = stale[i:i + FILTER_PAGE_SIZE]
+            present = self.vector_store.fetch(namespace, batch)
+            for record_id in batch:
+                if record_id not in present:
+                    graph.remove_record(record_id)
+                    state["deleted"] += 1
+        if self.deal_graphs.snapshot_dir:
+            self.deal_graphs.save(namespace)
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Optional
+
+
+def _compare(op: str, value: Any, operand: Any) -> bool:
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        if isinstance(value, list):
+            return any(v in operand for v in value)
+        return value in operand
+    if op == "$nin":
+        if isinstance(value, list):
+            return not any(v in operand for v in value)
+        return value not in operand
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+
+    if op not in ("$gt", "$gte", "$lt", "$lte"):
+        raise ValueError(f"Unsupported filter operator: {op}")
+    # Range operators only apply to numbers
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    return value <= operand
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against a flat record.
+
+    Supports implicit equality (``{"type": "RFP"}``), the comparison
+    operators ``$eq``, ``$ne``, ``$gt``, ``$gte``, ``$lt``, ``$lte``,
+    ``$in``, ``$nin``, ``$exists`` and the logical operators ``$and``/``$or``.
+    List-valued metadata matches ``$eq``/``$in`` if any element matches.
+
+    Args:
+        metadata: Flat record fields
+        filter: Filter expression, or None to match everything
+
+    Returns:
+        True if the record satisfies the filter
+    """
+    if not filter:
+        return True
+
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$eq" and isinstance(value, list):
+                    if operand not in value:
+                        return False
+                elif not _compare(op, value, operand):
+                    return False
+        elif isinstance(value, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+
+    return True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 
 class Document(BaseModel):
     id: str
@@ -34,3 +34,82 @@ class PatternResponse(BaseModel):
     metadata_patterns: Dict[str, Any]
     common_themes: List[Dict[str, Any]]
     score_statistics: Dict[str, Any]
+
+class ShardRange(BaseModel):
+    shard: str
+    range: List[int]
+
+class RebalanceRequest(BaseModel):
+    namespace: str
+    # A shard name, or hash ranges covering [0, 65536)
+    assignment: Union[str, List[ShardRange]]
+
+class RebalanceStatus(BaseModel):
+    namespace: str
+    state: str
+    copied: int = 0
+    removed: int = 0
+    started_at: float
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+class GraphQueryRequest(BaseModel):
+    query: str
+    namespace: str = "default"
+    top_k: int = 20
+    filter: Optional[Dict[str, Any]] = None
+    target_kind: str = "outcome"
+    edge_types: Optional[List[str]] = None
+    max_depth: int = 2
+    limit: int = 10
+
+class GraphNode(BaseModel):
+    node_id: str
+    kind: str
+    value: str
+    score: float
+    support: int = 0
+    records: List[str] = []
+
+class GraphQueryResponse(BaseModel):
+    query: str
+    hits: int
+    results: List[GraphNode]
+
+class GraphEdge(BaseModel):
+    source: str
+    target: str
+    type: str = "related_to"
+    weight: float = 1.0
+    source_kind: str = "record"
+    target_kind: str = "record"
+
+class GraphEdgeRequest(BaseModel):
+    namespace: str = "default"
+    edges: List[GraphEdge]
+
+class MaintenanceDeleteRequest(BaseModel):
+    namespace: str
+    filter: Optional[Dict[str, Any]] = None
+    prefix: Optional[str] = None
+    dry_run: bool = False
+    concurrency: int = 4
+    batch_size: int = 1000
+
+class MaintenanceStatus(BaseModel):
+    job_id: str
+    kind: str
+    namespace: str
+    state: str
+    filter: Optional[Dict[str, Any]] = None
+    prefix: Optional[str] = None
+    dry_run: bool = False
+    scanned: int = 0
+    matched: int = 0
+    deleted: int = 0
+    pages: int = 0
+    cursor: Optional[str] = None
+    created_at: float
+    updated_at: float
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
@@ -0,0 +1,416 @@
+"""Postgres/pgvector backend with the same interface as ``VectorStore``.
+
+Records live in the existing ``documents`` table (see
+migrations/005_pgvector_documents.sql for the namespace, record_id and
+metadata columns it adds). Vectors come from a client-side embedder
+(embeddings.py), since pgvector does not embed text itself.
+"""
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from psycopg import sql
+from psycopg_pool import ConnectionPool
+
+from common.instrumentation import stage
+from embeddings import embedder_from_env
+
+INDEX_METHODS = ("hnsw", "ivfflat")
+IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,62}$")
+
+def _vector_literal(vector: List[float]) -> str:
+    return "[" + ",".join(f"{v:.7g}" for v in vector) + "]"
+
+def filter_to_sql(filter: Optional[Dict[str, Any]]) -> Tuple[sql.Composable, List[Any]]:
+    """Translate a Pinecone-style filter into a WHERE clause on ``metadata``.
+
+    Mirrors ``metadata_filter.matches_filter``: list-valued fields match
+    ``$eq``/``$in`` when any element matches, range operators only match
+    numbers, and a missing field satisfies ``$ne``/``$nin``.
+
+    Returns:
+        (SQL condition, query parameters)
+    """
+    if not filter:
+        return sql.SQL("TRUE"), []
+
+    conditions: List[sql.Composable] = []
+    params: List[Any] = []
+
+    def field_matches(field: str, value: Any) -> sql.Composable:
+        # jsonb containment is true for equal scalars and for an array
+        # containing the scalar
+        params.extend([field, json.dumps(value)])
+        return sql.SQL("coalesce(metadata -> %s @> %s::jsonb, false)")
+
+    def any_matches(field: str, values: List[Any]) -> sql.Composable:
+        if not values:
+            return sql.SQL("FALSE")
+        return sql.SQL("({})").format(sql.SQL(" OR ").join(field_matches(field, v) for v in values))
+
+    for key, condition in filter.items():
+        if key in ("$and", "$or"):
+            parts = []
+            for sub in condition:
+                sub_sql, sub_params = filter_to_sql(sub)
+                parts.append(sub_sql)
+                params.extend(sub_params)
+            joiner = " AND " if key == "$and" else " OR "
+            empty = "TRUE" if key == "$and" else "FALSE"
+            conditions.append(sql.SQL("({})").format(sql.SQL(joiner).join(parts)) if parts else sql.SQL(empty))
+            continue
+
+        operators = condition if isinstance(condition, dict) else {"$eq": condition}
+        for op, operand in operators.items():
+            if op == "$eq":
+                conditions.append(field_matches(key, operand))
+            elif op == "$ne":
+                params.extend([key, json.dumps(operand)])
+                conditions.append(sql.SQL("NOT coalesce(metadata -> %s = %s::jsonb, false)"))
+            elif op == "$in":
+                conditions.append(any_matches(key, list(operand)))
+            elif op == "$nin":
+                conditions.append(sql.SQL("NOT {}").format(any_matches(key, list(operand))))
+            elif op == "$exists":
+                params.append(key)
+                check = "<>" if operand else "="
+                conditions.append(sql.SQL(f"coalesce(jsonb_typeof(metadata -> %s), 'null') {check} 'null'"))
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                comparison = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}[op]
+                params.extend([key, key, operand])
+                conditions.append(sql.SQL(
+                    "CASE WHEN jsonb_typeof(metadata -> %s) = 'number' "
+                    f"THEN (metadata ->> %s)::numeric {comparison} %s ELSE false END"
+                ))
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+
+    if not conditions:
+        # {} or {"field": {}}: no constraints, like matches_filter
+        return sql.SQL("TRUE"), params
+    return sql.SQL("({})").format(sql.SQL(" AND ").join(conditions)), params
+
+class PgVectorStore:
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        embedder: Any = None,
+        table: str = "documents",
+        min_connections: int = 1,
+        max_connections: int = 10
+    ):
+        """
+        Args:
+            dsn: Postgres connection string, defaults to PGVECTOR_DSN or DATABASE_URL
+            embedder: Object with ``embed(texts)``; defaults to ``embedder_from_env()``
+            table: Table holding the records (must have the 005 migration applied)
+            min_connections: Connections kept open in the pool
+            max_connections: Upper bound on pooled connections
+        """
+        self.dsn = dsn or os.getenv("PGVECTOR_DSN") or os.getenv("DATABASE_URL")
+        if not self.dsn:
+            raise ValueError("PGVECTOR_DSN or DATABASE_URL environment variable not set")
+        if not IDENTIFIER_PATTERN.match(table):
+            raise ValueError(f"Invalid table name: {table}")
+
+        self.embedder = embedder or embedder_from_env()
+        self.table = sql.Identifier(table)
+        self.table_name = table
+        self.ef_search = int(os.getenv("PGVECTOR_EF_SEARCH", "100"))
+        self.probes = int(os.getenv("PGVECTOR_PROBES", "10"))
+        self.pool = ConnectionPool(
+            self.dsn,
+            min_size=min_connections,
+            max_size=max_connections,
+            open=True,
+            name="pgvector"
+        )
+
+    def close(self):
+        self.pool.close()
+
+    def upsert_documents(
+        self,
+        namespace: str,
+        documents: List[Dict[str, Any]],
+        batch_size: int = 500
+    ) -> Dict[str, int]:
+        """Embed and bulk-load documents in Pinecone upsert format.
+
+        Each batch is COPYed into a temp table and merged with one
+        INSERT ... ON CONFLICT, so a batch costs a few round trips instead
+        of one INSERT per record.
+        """
+        if not namespace:
+            raise ValueError("Namespace is required for data isolation")
+
+        upserted_count = 0
+        for i in range(0, len(documents), batch_size):
+            # ON CONFLICT can't touch the same row twice in one statement
+            batch = list({doc["_id"]: doc for doc in documents[i:i + batch_size]}.values())
+            with stage("embed", texts=len(batch)):
+                vectors = self.embedder.embed([doc.get("content", "") for doc in batch])
+
+            with stage("pgvector.upsert", namespace=namespace, records=len(batch)):
+                with self.pool.connection() as conn, conn.cursor() as cur:
+                    cur.execute("""
+                        CREATE TEMP TABLE IF NOT EXISTS dv_upsert (
+                            record_id text, name text, file_path text, file_type text,
+                            content_text text, metadata jsonb, embedding text
+                        ) ON COMMIT DELETE ROWS
+                    """)
+                    with cur.copy(
+                        "COPY dv_upsert (record_id, name, file_path, file_type, content_text, metadata, embedding) "
+                        "FROM STDIN"
+                    ) as copy:
+                        for doc, vector in zip(batch, vectors):
+                            metadata = {k: v for k, v in doc.items() if k not in ("_id", "content")}
+                            copy.write_row((
+                                doc["_id"],
+                                str(metadata.get("filename") or doc["_id"]),
+                                str(metadata.get("file_path", "")),
+                                metadata.get("file_type"),
+                                doc.get("content", ""),
+                                json.dumps(metadata),
+                                _vector_literal(vector)
+                            ))
+                    cur.execute(sql.SQL("""
+                        INSERT INTO {table} (namespace, record_id, name, file_path, file_type,
+                                             content_text, metadata, embedding)
+                        SELECT %s, record_id, name, file_path, file_type, content_text, metadata,
+                               embedding::vector
+                        FROM dv_upsert
+                        ON CONFLICT (namespace, record_id) DO UPDATE SET
+                            name = EXCLUDED.name,
+                            file_path = EXCLUDED.file_path,
+                            file_type = EXCLUDED.file_type,
+                            content_text = EXCLUDED.content_text,
+                            metadata = EXCLUDED.metadata,
+                            embedding = EXCLUDED.embedding
+                    """).format(table=self.table), [namespace])
+            upserted_count += len(batch)
+
+        return {"upserted": upserted_count}
+
+    def search(
+        self,
+        namespace: str,
+        query_text: str,
+        top_k: int = 10,
+        filter: Optional[Dict[str, Any]] = None,
+        rerank: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Cosine similarity search, optionally with a metadata filter.
+
+        ``rerank`` is accepted for interface compatibility; there is no
+        reranker in this backend.
+        """
+        if not namespace:
+            raise ValueError("Namespace is required for data isolation")
+
+        with stage("embed", texts=1):
+            vector = _vector_literal(self.embedder.embed([query_text])[0])
+        where, params = filter_to_sql(filter)
+
+        with stage("pgvector.search", namespace=namespace, top_k=top_k) as span:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                # Filters are applied after the ANN scan, so widen the
+                # candidate list to still return top_k rows
+                cur.execute("SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true)",
+                            [str(max(self.ef_search, top_k)), str(self.probes)])
+                cur.execute(sql.SQL("""
+                    SELECT record_id, content_text, metadata, 1 - (embedding <=> %s::vector) AS score
+                    FROM {table}
+                    WHERE namespace = %s AND embedding IS NOT NULL AND {where}
+                    ORDER BY embedding <=> %s::vector
+                    LIMIT %s
+                """).format(table=self.table, where=where), [vector, namespace, *params, vector, top_k])
+                rows = cur.fetchall()
+            span.set("hits", len(rows))
+
+        results = []
+        for record_id, content, metadata, score in rows:
+            fields = {"content": content, **(metadata or {})}
+            results.append({
+                "id": record_id,
+                "score": float(score),
+                "fields": fields,
+                "metadata": fields
+            })
+        return results
+
+    def fetch(self, namespace: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch records by IDs."""
+        if not namespace:
+            raise ValueError("Namespace is required")
+
+        with stage("pgvector.fetch", namespace=namespace, ids=len(ids)):
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(sql.SQL("""
+                    SELECT record_id, content_text, metadata FROM {table}
+                    WHERE namespace = %s AND record_id = ANY(%s)
+                """).format(table=self.table), [namespace, ids])
+                rows = cur.fetchall()
+
+        return {
+            record_id: {"id": record_id, "fields": {"content": content, **(metadata or {})}}
+            for record_id, content, metadata in rows
+        }
+
+    def list_ids(self, namespace: str, prefix: Optional[str] = None, limit: int = 1000) -> List[str]:
+        """List record IDs with optional prefix filter, ``limit`` per page."""
+        all_ids: List[str] = []
+        for ids, _ in self.iter_id_pages(namespace, prefix=prefix, page_size=limit):
+            all_ids.extend(ids)
+        return all_ids
+
+    def iter_id_pages(
+        self,
+        namespace: str,
+        prefix: Optional[str] = None,
+        page_size: int = 100,
+        cursor: Optional[str] = None
+    ) -> Iterator[Tuple[List[str], Optional[str]]]:
+        """Yield pages of record IDs in id order (keyset pagination).
+
+        The cursor is the last id of a page, so deleting listed records
+        never shifts later pages.
+        """
+        if not namespace:
+            raise ValueError("Namespace is required")
+
+        last = cursor or ""
+        while True:
+            with stage("pgvector.list", namespace=namespace):
+                with self.pool.connection() as conn, conn.cursor() as cur:
+                    cur.execute(sql.SQL("""
+                        SELECT record_id FROM {table}
+                        WHERE namespace = %s AND record_id > %s AND starts_with(record_id, %s)
+                        ORDER BY record_id
+                        LIMIT %s
+                    """).format(table=self.table), [namespace, last, prefix or "", page_size])
+                    page = [row[0] for row in cur.fetchall()]
+            if len(page) < page_size:
+                yield page, None
+                return
+            last = page[-1]
+            yield page, last
+
+    def delete(self, namespace: str, ids: Optional[List[str]] = None, delete_all: bool = False) -> Dict[str, Any]:
+        """Delete records by IDs or entire namespace."""
+        if not namespace:
+            raise ValueError("Namespace is required")
+
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            if delete_all:
+                with stage("pgvector.delete", namespace=namespace):
+                    cur.execute(sql.SQL("DELETE FROM {table} WHERE namespace = %s AND record_id IS NOT NULL")
+                                .format(table=self.table), [namespace])
+                return {"deleted": "all"}
+            elif ids:
+                with stage("pgvector.delete", namespace=namespace, ids=len(ids)):
+                    cur.execute(sql.SQL("DELETE FROM {table} WHERE namespace = %s AND record_id = ANY(%s)")
+                                .format(table=self.table), [namespace, ids])
+                return {"deleted": len(ids)}
+            else:
+                raise ValueError("Must provide either ids or delete_all=True")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get record counts and the vector indexes on the table."""
+        with stage("pgvector.stats"):
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(sql.SQL("""
+                    SELECT namespace, count(*) FROM {table}
+                    WHERE record_id IS NOT NULL GROUP BY namespace
+                """).format(table=self.table))
+                counts = dict(cur.fetchall())
+
+        return {
+            "total_vector_count": sum(counts.values()),
+            "namespaces": sorted(counts),
+            "indexes": self.list_indexes()
+        }
+
+    # -- index management ----------------------------------------------------
+
+    def _index_name(self, method: str) -> str:
+        return f"idx_{self.table_name}_embedding_{method}"
+
+    def list_indexes(self) -> List[Dict[str, str]]:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT indexname, indexdef FROM pg_indexes
+                WHERE tablename = %s AND (indexdef ILIKE '%%USING hnsw%%' OR indexdef ILIKE '%%USING ivfflat%%')
+            """, [self.table_name])
+            return [{"name": name, "definition": definition} for name, definition in cur.fetchall()]
+
+    def create_index(
+        self,
+        method: str = "hnsw",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        concurrently: bool = True
+    ) -> str:
+        """Build an ANN index on ``embedding`` for cosine distance.
+
+        Args:
+            method: "hnsw" (better recall/latency, slower build) or "ivfflat"
+                (fast build; build it after loading data, since its lists
+                are trained on the rows present)
+            m: HNSW graph degree
+            ef_construction: HNSW build-time candidate list size
+            lists: ivfflat list count; defaults to rows/1000 (sqrt(rows)
+                above a million rows), per the pgvector guidance
+            concurrently: Build without blocking writes
+
+        Returns:
+            The index name
+        """
+        if method not in INDEX_METHODS:
+            raise ValueError(f"Index method must be one of {INDEX_METHODS}")
+        name = self._index_name(method)
+
+        with self.pool.connection() as conn:
+            if method == "hnsw":
+                options = sql.SQL("WITH (m = {}, ef_construction = {})").format(
+                    sql.Literal(int(m)), sql.Literal(int(ef_construction)))
+            else:
+                if lists is None:
+                    rows = conn.execute(sql.SQL("SELECT count(*) FROM {table} WHERE embedding IS NOT NULL")
+                                        .format(table=self.table)).fetchone()[0]
+                    lists = rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows))
+                options = sql.SQL("WITH (lists = {})").format(sql.Literal(max(int(lists), 1)))
+            conn.commit()
+
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            conn.autocommit = True
+            try:
+                with stage("pgvector.create_index", method=method):
+                    conn.execute(sql.SQL(
+                        "CREATE INDEX {concurrently} IF NOT EXISTS {name} ON {table} "
+                        "USING {method} (embedding vector_cosine_ops) {options}"
+                    ).format(
+                        concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+                        name=sql.Identifier(name),
+                        table=self.table,
+                        method=sql.SQL(method),
+                        options=options
+                    ))
+            finally:
+                conn.autocommit = False
+        return name
+
+    def drop_index(self, method: str = "hnsw") -> str:
+        if method not in INDEX_METHODS:
+            raise ValueError(f"Index method must be one of {INDEX_METHODS}")
+        name = self._index_name(method)
+        with self.pool.connection() as conn:
+            conn.autocommit = True
+            try:
+                conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+            finally:
+                conn.autocommit = False
+        return name
@@ -0,0 +1,514 @@
+"""Namespace sharding across several indexes.
+
+A shard map routes each namespace either to a single shard or, for large
+namespaces, splits it by a hash of the record id into ranges that live on
+different shards. ``ShardedVectorStore`` exposes the same methods as
+``VectorStore`` so main.py can use either.
+
+Shard map file (``VECTOR_STORE_SHARDS``):
+
+    {
+      "default": "primary",
+      "score_normalization": "raw",
+      "shards": {
+        "primary":  {"index": "deal-velocity"},
+        "govcon-a": {"index": "deal-velocity-govcon-a"},
+        "govcon-b": {"index": "deal-velocity-govcon-b"}
+      },
+      "namespaces": {
+        "tenant-acme": "govcon-a",
+        "govcon": [
+          {"shard": "govcon-a", "range": [0, 32768]},
+          {"shard": "govcon-b", "range": [32768, 65536]}
+        ]
+      }
+    }
+
+Namespaces not listed go to the default shard. Hash ranges cover the
+16-bit space ``[0, 65536)``.
+
+A rebalance in progress is kept under ``"migrations"``. One found there at
+startup was interrupted by a restart and is aborted (see
+``ShardedVectorStore.abort_interrupted``).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from common.instrumentation import stage
+from vector_store import VectorStore
+
+HASH_SPACE = 65536
+# Ids listed per page when removing records a shard no longer owns
+CLEANUP_PAGE_SIZE = 1000
+SCORE_NORMALIZATIONS = ("raw", "minmax", "rrf")
+RRF_K = 60
+
+Assignment = List[Dict[str, Any]]
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SHARD_FANOUT_WORKERS", "16")),
+    thread_name_prefix="shard-fanout"
+)
+
+def id_bucket(record_id: str) -> int:
+    return int.from_bytes(hashlib.md5(record_id.encode("utf-8")).digest()[:2], "big")
+
+def normalize_assignment(assignment: Union[str, Assignment]) -> Assignment:
+    """Expand a shard name into a full-range assignment and validate ranges."""
+    if isinstance(assignment, str):
+        return [{"shard": assignment, "range": [0, HASH_SPACE]}]
+
+    ranges = sorted(assignment, key=lambda a: a["range"][0])
+    position = 0
+    for entry in ranges:
+        start, end = entry["range"]
+        if start != position or end <= start:
+            raise ValueError(f"Hash ranges must cover [0, {HASH_SPACE}) without gaps or overlaps")
+        position = end
+    if position != HASH_SPACE:
+        raise ValueError(f"Hash ranges must cover [0, {HASH_SPACE}) without gaps or overlaps")
+    return [{"shard": entry["shard"], "range": list(entry["range"])} for entry in ranges]
+
+def _shard_for(assignment: Assignment, record_id: str) -> str:
+    if len(assignment) == 1:
+        return assignment[0]["shard"]
+    bucket = id_bucket(record_id)
+    for entry in assignment:
+        start, end = entry["range"]
+        if start <= bucket < end:
+            return entry["shard"]
+    raise ValueError(f"No shard covers bucket {bucket}")
+
+class ShardMap:
+    def __init__(self, config: Dict[str, Any], path: Optional[str] = None):
+        self.path = path
+        self.default = config.get("default", "primary")
+        self.score_normalization = config.get("score_normalization", "raw")
+        if self.score_normalization not in SCORE_NORMALIZATIONS:
+            raise ValueError(f"score_normalization must be one of {SCORE_NORMALIZATIONS}")
+        self.shards: Dict[str, Dict[str, Any]] = config.get("shards", {self.default: {}})
+        self.namespaces: Dict[str, Assignment] = {
+            namespace: normalize_assignment(assignment)
+            for namespace, assignment in config.get("namespaces", {}).items()
+        }
+        # namespace -> {"to": Assignment, "ops": {id: "upsert" | "delete"}} while
+        # a rebalance runs; "ops" keeps the last client write to each id.
+        # "aborting" is set while a failed or interrupted one is cleaned up.
+        self.migrations: Dict[str, Dict[str, Any]] = config.get("migrations", {})
+        for migration in self.migrations.values():
+            migration.setdefault("ops", {})
+        self.lock = threading.RLock()
+
+        for assignment in list(self.namespaces.values()) + [m["to"] for m in self.migrations.values()]:
+            for entry in assignment:
+                if entry["shard"] not in self.shards:
+                    raise ValueError(f"Unknown shard '{entry['shard']}'")
+
+    @classmethod
+    def load(cls, path: str) -> "ShardMap":
+        with open(path) as f:
+            return cls(json.load(f), path=path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "default": self.default,
+                "score_normalization": self.score_normalization,
+                "shards": self.shards,
+                "namespaces": self.namespaces,
+                "migrations": self.migrations
+            }
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def assignment(self, namespace: str) -> Assignment:
+        with self.lock:
+            return self.namespaces.get(namespace) or normalize_assignment(self.default)
+
+    def read_shard(self, namespace: str, record_id: str) -> str:
+        return _shard_for(self.assignment(namespace), record_id)
+
+    def write_shards(self, namespace: str, record_id: str) -> Set[str]:
+        """Shards a write must go to; both sides while a rebalance runs."""
+        with self.lock:
+            shards = {_shard_for(self.assignment(namespace), record_id)}
+            migration = self.migrations.get(namespace)
+            if migration and not migration.get("aborting"):
+                shards.add(_shard_for(migration["to"], record_id))
+            return shards
+
+    def namespace_shards(self, namespace: str, include_migration: bool = False) -> List[str]:
+        with self.lock:
+            shards = [entry["shard"] for entry in self.assignment(namespace)]
+            migration = self.migrations.get(namespace)
+            if include_migration and migration:
+                shards += [entry["shard"] for entry in migration["to"]]
+            return list(dict.fromkeys(shards))
+
+class ShardedVectorStore:
+    """Routes VectorStore calls to shards and scatter-gathers searches."""
+
+    def __init__(self, shard_map: ShardMap, store_factory: Callable[[str, Dict[str, Any]], VectorStore]):
+        self.shard_map = shard_map
+        self.store_factory = store_factory
+        self.stores: Dict[str, VectorStore] = {}
+        self.stores_lock = threading.Lock()
+        self.rebalances: Dict[str, Dict[str, Any]] = {}
+        # Held by the rebalance copy while it checks and writes a batch, and by
+        # clients while they record a write, so a copy never overwrites a newer write
+        self.copy_locks: Dict[str, threading.Lock] = {}
+
+        # Migrations in a loaded map were cut short by a restart. The client
+        # writes they recorded were lost with the process, so the copy can't
+        # resume safely: stop dual-writing now, abort_interrupted() cleans up
+        with shard_map.lock:
+            for namespace, migration in shard_map.migrations.items():
+                migration.update(aborting=True, ops={})
+                self.rebalances[namespace] = self._new_progress(namespace, "aborting")
+            if shard_map.migrations:
+                shard_map.save()
+
+    def store(self, shard: str) -> VectorStore:
+        with self.stores_lock:
+            if shard not in self.stores:
+                self.stores[shard] = self.store_factory(shard, self.shard_map.shards[shard])
+            return self.stores[shard]
+
+    def _fan_out(self, calls: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        if len(calls) == 1:
+            shard, call = next(iter(calls.items()))
+            return {shard: call()}
+        futures = {shard: _executor.submit(call) for shard, call in calls.items()}
+        return {shard: future.result() for shard, future in futures.items()}
+
+    def _route_writes(self, namespace: str, ids: List[str], op: str) -> Dict[str, List[int]]:
+        """Map each shard to the positions in ``ids`` it must receive.
+
+        While the namespace is being rebalanced the write is also recorded in
+        the migration (before it is sent), so the copy step skips these ids.
+        """
+        by_shard: Dict[str, List[int]] = {}
+        with self.shard_map.lock:
+            migration = self.shard_map.migrations.get(namespace)
+            if migration and migration.get("aborting"):
+                migration = None
+            for position, record_id in enumerate(ids):
+                for shard in self.shard_map.write_shards(namespace, record_id):
+                    by_shard.setdefault(shard, []).append(position)
+            copy_lock = self.copy_locks.setdefault(namespace, threading.Lock()) if migration else None
+        if migration:
+            with copy_lock:
+                for record_id in ids:
+                    migration["ops"][record_id] = op
+        return by_shard
+
+    def upsert_documents(self, namespace: str, documents: List[Dict[str, Any]], batch_size: int = 96) -> Dict[str, int]:
+        by_shard = {
+            shard: [documents[position] for position in positions]
+            for shard, positions in self._route_writes(namespace, [d["_id"] for d in documents], "upsert").items()
+        }
+
+        self._fan_out({
+            shard: (lambda shard=shard, docs=docs: self.store(shard).upsert_documents(namespace, docs, batch_size))
+            for shard, docs in by_shard.items()
+        })
+        return {"upserted": len(documents)}
+
+    def search(
+        self,
+        namespace: str,
+        query_text: str,
+        top_k: int = 10,
+        filter: Optional[Dict[str, Any]] = None,
+        rerank: bool = True
+    ) -> List[Dict[str, Any]]:
+        shards = self.shard_map.namespace_shards(namespace)
+        if len(shards) == 1:
+            return self.store(shards[0]).search(namespace, query_text, top_k, filter, rerank)
+
+        with stage("shard.scatter", namespace=namespace, shards=len(shards)):
+            per_shard = self._fan_out({
+                shard: (lambda shard=shard: self.store(shard).search(namespace, query_text, top_k, filter, rerank))
+                for shard in shards
+            })
+
+        with stage("shard.gather"):
+            return merge_results(per_shard, top_k, self.shard_map.score_normalization)
+
+    def fetch(self, namespace: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        by_shard: Dict[str, List[str]] = {}
+        for record_id in ids:
+            by_shard.setdefault(self.shard_map.read_shard(namespace, record_id), []).append(record_id)
+
+        records: Dict[str, Dict[str, Any]] = {}
+        for result in self._fan_out({
+            shard: (lambda shard=shard, shard_ids=shard_ids: self.store(shard).fetch(namespace, shard_ids))
+            for shard, shard_ids in by_shard.items()
+        }).values():
+            records.update(result)
+        return records
+
+    def list_ids(self, namespace: str, prefix: Optional[str] = None, limit: int = 1000) -> List[str]:
+        results = self._fan_out({
+            shard: (lambda shard=shard: self.store(shard).list_ids(namespace, prefix, limit))
+            for shard in self.shard_map.namespace_shards(namespace)
+        })
+        return list(dict.fromkeys(record_id for ids in results.values() for record_id in ids))
+
+    def iter_id_pages(
+        self,
+        namespace: str,
+        prefix: Optional[str] = None,
+        page_size: int = 100,
+        cursor: Optional[str] = None
+    ) -> Iterator[Tuple[List[str], Optional[str]]]:
+        """Page through each shard of the namespace in turn.
+
+        The cursor is ``[shard position, shard cursor]`` as JSON.
+        """
+        shards = self.shard_map.namespace_shards(namespace)
+        position, inner = json.loads(cursor) if cursor else (0, None)
+        for i in range(position, len(shards)):
+            pages = self.store(shards[i]).iter_id_pages(namespace, prefix, page_size, inner if i == position else None)
+            for ids, next_inner in pages:
+                if next_inner is not None:
+                    yield ids, json.dumps([i, next_inner])
+                elif i + 1 < len(shards):
+                    yield ids, json.dumps([i + 1, None])
+                else:
+                    yield ids, None
+
+    def delete(self, namespace: str, ids: Optional[List[str]] = None, delete_all: bool = False) -> Dict[str, Any]:
+        if delete_all:
+            self._fan_out({
+                shard: (lambda shard=shard: self.store(shard).delete(namespace, delete_all=True))
+                for shard in self.shard_map.namespace_shards(namespace, include_migration=True)
+            })
+            return {"deleted": "all"}
+        if not ids:
+            raise ValueError("Must provide either ids or delete_all=True")
+
+        # Recording the delete keeps the copy step from resurrecting it
+        by_shard = {
+            shard: [ids[position] for position in positions]
+            for shard, positions in self._route_writes(namespace, ids, "delete").items()
+        }
+
+        self._fan_out({
+            shard: (lambda shard=shard, shard_ids=shard_ids: self.store(shard).delete(namespace, ids=shard_ids))
+            for shard, shard_ids in by_shard.items()
+        })
+        return {"deleted": len(ids)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        shards = list(self.shard_map.shards)
+        stats = self._fan_out({shard: (lambda shard=shard: self.store(shard).get_stats()) for shard in shards})
+        namespaces = sorted({ns for s in stats.values() for ns in s["namespaces"]})
+        return {
+            "total_vector_count": sum(s["total_vector_count"] for s in stats.values()),
+            "namespaces": namespaces,
+            "shards": stats
+        }
+
+    def rebalance(self, namespace: str, assignment: Union[str, Assignment], batch_size: int = 96) -> Dict[str, Any]:
+        """Move a namespace to a new shard assignment while it stays online.
+
+        1. Record the migration: from now on writes and deletes go to both
+           the current and the new shard of each id; reads stay on the
+           current assignment, which remains complete.
+        2. Copy every record whose shard changes to its new shard, skipping
+           ids a client has written or deleted since step 1: dual-writing
+           already put their latest state on the new shard.
+        3. Switch the namespace to the new assignment.
+        4. Delete the moved records from their old shards.
+
+        Shards are read a page of ids at a time, never listed in full. If a
+        step before the switch fails, the copies are removed from the new
+        shards and the namespace stays on its current assignment.
+
+        Returns:
+            Progress dict, also kept in ``self.rebalances[namespace]``
+        """
+        self.begin_rebalance(namespace, assignment)
+        return self.run_rebalance(namespace, batch_size)
+
+    def begin_rebalance(self, namespace: str, assignment: Union[str, Assignment]) -> Dict[str, Any]:
+        """Validate the target and start dual-writing (step 1 of ``rebalance``)."""
+        target = normalize_assignment(assignment)
+        for entry in target:
+            if entry["shard"] not in self.shard_map.shards:
+                raise ValueError(f"Unknown shard '{entry['shard']}'")
+
+        with self.shard_map.lock:
+            if namespace in self.shard_map.migrations:
+                raise ValueError(f"Namespace '{namespace}' is already being rebalanced")
+            self.shard_map.migrations[namespace] = {"to": target, "ops": {}}
+            self.shard_map.save()
+
+        progress = self._new_progress(namespace, "copying")
+        self.rebalances[namespace] = progress
+        return progress
+
+    @staticmethod
+    def _new_progress(namespace: str, state: str) -> Dict[str, Any]:
+        return {"namespace": namespace, "state": state, "copied": 0, "removed": 0,
+                "started_at": time.time(), "finished_at": None, "error": None}
+
+    def run_rebalance(self, namespace: str, batch_size: int = 96) -> Dict[str, Any]:
+        """Copy, cut over and clean up (steps 2-4 of ``rebalance``)."""
+        progress = self.rebalances[namespace]
+        with self.shard_map.lock:
+            source = self.shard_map.assignment(namespace)
+            migration = self.shard_map.migrations[namespace]
+            target = migration["to"]
+            copy_lock = self.copy_locks.setdefault(namespace, threading.Lock())
+        ops = migration["ops"]
+        cut_over = False
+
+        try:
+            for old_shard in dict.fromkeys(entry["shard"] for entry in source):
+                store = self.store(old_shard)
+                for ids, _ in store.iter_id_pages(namespace, page_size=batch_size):
+                    batch = [
+                        record_id for record_id in ids
+                        if _shard_for(source, record_id) == old_shard
+                        and _shard_for(target, record_id) != old_shard
+                    ]
+                    if not batch:
+                        continue
+                    records = store.fetch(namespace, batch)
+                    with copy_lock:
+                        # A write recorded after the fetch is newer than the
+                        # fetched copy; clients record before they write, so
+                        # checking under the lock is enough
+                        by_target: Dict[str, List[Dict[str, Any]]] = {}
+                        for record_id, record in records.items():
+                            if record_id not in ops:
+                                by_target.setdefault(_shard_for(target, record_id), []).append(
+                                    {"_id": record_id, **record["fields"]}
+                                )
+                        for new_shard, documents in by_target.items():
+                            self.store(new_shard).upsert_documents(namespace, documents, batch_size)
+                            progress["copied"] += len(documents)
+
+            with self.shard_map.lock:
+                self.shard_map.migrations.pop(namespace)
+                self.shard_map.namespaces[namespace] = target
+                self.shard_map.save()
+            cut_over = True
+
+            with copy_lock:
+                last_ops = dict(ops)
+            # Client deletes already reached the new shard; re-apply the ones
+            # that weren't followed by a write in case one raced the copy
+            deleted: Dict[str, List[str]] = {}
+            for record_id, op in last_ops.items():
+                if op == "delete":
+                    deleted.setdefault(_shard_for(target, record_id), []).append(record_id)
+            for shard, shard_ids in deleted.items():
+                self.store(shard).delete(namespace, ids=shard_ids)
+
+            # Moved records, copied or dual-written, are left on their old shards
+            progress["state"] = "cleaning_up"
+            for old_shard in dict.fromkeys(entry["shard"] for entry in source):
+                progress["removed"] += self._remove_strays(namespace, old_shard, target)
+
+            progress["state"] = "completed"
+        except Exception as e:
+            progress["error"] = str(e)
+            if not cut_over:
+                self._abort_rebalance(namespace, progress)
+            progress["state"] = "failed"
+        finally:
+            progress["finished_at"] = time.time()
+        return progress
+
+    def abort_interrupted(self):
+        """Finish aborting the rebalances that a restart cut short.
+
+        Run once at startup, in the background: it pages through the new
+        shards of each one.
+        """
+        for namespace, progress in list(self.rebalances.items()):
+            if progress["state"] != "aborting":
+                continue
+            progress["error"] = "Interrupted by a restart"
+            self._abort_rebalance(namespace, progress)
+            progress["state"] = "aborted"
+            progress["finished_at"] = time.time()
+
+    def _abort_rebalance(self, namespace: str, progress: Dict[str, Any]):
+        """Stop dual-writing and remove what the rebalance put on the new shards.
+
+        The source assignment is still complete, so every record on a new
+        shard that the source routes elsewhere is a copy, made by the
+        rebalance or by a dual-written client write. The migration stays in
+        the shard map, marked aborting, until they are gone, so a restart
+        during cleanup picks it up again.
+        """
+        with self.shard_map.lock:
+            migration = self.shard_map.migrations.get(namespace)
+            if migration is None:
+                return
+            if not migration.get("aborting"):
+                migration.update(aborting=True, ops={})
+                self.shard_map.save()
+            source = self.shard_map.assignment(namespace)
+            target = migration["to"]
+        try:
+            for shard in dict.fromkeys(entry["shard"] for entry in target):
+                progress["removed"] += self._remove_strays(namespace, shard, source)
+        except Exception as e:
+            message = f"cleaning up copies on the new shards failed: {e}"
+            progress["error"] = f"{progress['error']}; {message}" if progress["error"] else message
+            return
+        with self.shard_map.lock:
+            self.shard_map.migrations.pop(namespace, None)
+            self.shard_map.save()
+
+    def _remove_strays(self, namespace: str, shard: str, assignment: Assignment) -> int:
+        """Delete the records on ``shard`` that ``assignment`` routes elsewhere."""
+        store = self.store(shard)
+        removed = 0
+        for ids, _ in store.iter_id_pages(namespace, page_size=CLEANUP_PAGE_SIZE):
+            strays = [record_id for record_id in ids if _shard_for(assignment, record_id) != shard]
+            if strays:
+                store.delete(namespace, ids=strays)
+                removed += len(strays)
+        return removed
+
+def merge_results(per_shard: Dict[str, List[Dict[str, Any]]], top_k: int, normalization: str = "raw") -> List[Dict[str, Any]]:
+    """Merge per-shard top-k lists into one top-k list.
+
+    Normalization:
+        raw:    keep scores; right when all shards use the same embedding
+                model and reranker, since scores are then comparable
+        minmax: rescale each shard's scores to [0, 1] before merging, for
+                shards backed by different models or backends
+        rrf:    reciprocal-rank fusion; ignores score scales entirely
+    """
+    merged = []
+    for shard, results in per_shard.items():
+        scores = [r["score"] for r in results]
+        low, high = (min(scores), max(scores)) if scores else (0.0, 0.0)
+        for rank, result in enumerate(results):
+            result = dict(result, shard=shard, raw_score=result["score"])
+            if normalization == "minmax":
+                result["score"] = (result["score"] - low) / (high - low) if high > low else 1.0
+            elif normalization == "rrf":
+                result["score"] = 1.0 / (RRF_K + rank + 1)
+            merged.append(result)
+
+    merged.sort(key=lambda r: r["score"], reverse=True)
+    return merged[:top_k]
@@ -1,6 +1,7 @@
 import requests
 import json
 import os
+import time
 
 BASE_URL = "http://localhost:8001"
 
@@ -11,17 +12,13 @@ def test_health():
     print(f"Response: {response.json()}\n")
     assert response.status_code == 200
 
-def test_embed():
-    """Test embedding generation."""
-    data = {"text": "This is a test document about RFP responses."}
-    response = requests.post(f"{BASE_URL}/embed", json=data)
-    print(f"Embed: {response.status_code}")
-    if response.status_code == 200:
-        result = response.json()
-        print(f"Embedding dimension: {result['dimension']}")
-        print(f"First 5 values: {result['embedding'][:5]}\n")
-    else:
-        print(f"Error: {response.text}\n")
+def test_stats():
+    """Test index statistics (embeddings are generated by the index, so there is no /embed)."""
+    response = requests.get(f"{BASE_URL}/stats")
+    print(f"Stats: {response.status_code}")
+    assert response.status_code == 200
+    stats = response.json()
+    print(f"Vectors: {stats['total_vector_count']}, namespaces: {stats['namespaces']}\n")
 
 def test_upsert():
     """Test document upload."""
@@ -30,12 +27,12 @@ def test_upsert():
             {
                 "id": "doc1",
                 "text": "RFP response for cloud infrastructure project",
-                "metadata": {"type": "RFP", "category": "infrastructure"}
+                "metadata": {"type": "RFP", "category": "infrastructure", "deal_id": "deal-1", "outcome": "won"}
             },
             {
                 "id": "doc2",
                 "text": "Contract agreement for software development",
-                "metadata": {"type": "Contract", "category": "software"}
+                "metadata": {"type": "Contract", "category": "software", "deal_id": "deal-2", "outcome": "lost"}
             }
         ],
         "namespace": ""
@@ -81,16 +78,76 @@ def test_patterns():
     else:
         print(f"Error: {response.text}\n")
 
+def test_metrics():
+    """Test Prometheus metrics and request id propagation."""
+    response = requests.get(f"{BASE_URL}/metrics", headers={"X-Request-ID": "test-metrics"})
+    print(f"Metrics: {response.status_code}")
+    assert response.status_code == 200
+    assert response.headers.get("x-request-id") == "test-metrics"
+    stage_lines = [l for l in response.text.splitlines() if l.startswith("dv_stage_duration_seconds_count")]
+    print(f"Stages recorded: {len(stage_lines)}\n")
+
+def test_graph_query():
+    """Test joining semantic search with Deal Memory Graph traversal."""
+    payload = {
+        "query": "liability limitations",
+        "namespace": "default",
+        "target_kind": "outcome"
+    }
+    response = requests.post(f"{BASE_URL}/graph/query", json=payload)
+    print(f"Graph query: {response.status_code}")
+    if response.status_code == 200:
+        data = response.json()
+        print(f"Hits: {data['hits']}")
+        for node in data["results"]:
+            print(f"  {node['value']}: score={node['score']:.3f} support={node['support']}")
+        print()
+    else:
+        print(f"Error: {response.text}\n")
+
+def test_maintenance_dry_run():
+    """Test a dry-run bulk delete job."""
+    payload = {"namespace": "default", "filter": {"type": "RFP"}, "dry_run": True}
+    response = requests.post(f"{BASE_URL}/maintenance/delete", json=payload)
+    print(f"Maintenance delete: {response.status_code}")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(50):
+        status = requests.get(f"{BASE_URL}/maintenance/jobs/{job_id}").json()
+        if status["state"] not in ("queued", "running"):
+            break
+        time.sleep(0.2)
+    print(f"State: {status['state']}, scanned: {status['scanned']}, matched: {status['matched']}\n")
+    assert status["state"] == "completed"
+    assert status["deleted"] == 0
+
+def test_shards():
+    """Test the shard map endpoint (only when VECTOR_STORE_SHARDS is set)."""
+    response = requests.get(f"{BASE_URL}/shards")
+    print(f"Shards: {response.status_code}")
+    if response.status_code == 400:
+        print("Sharding not configured, skipping\n")
+        return
+    assert response.status_code == 200
+    data = response.json()
+    print(f"Shards: {list(data['shards'])}")
+    print(f"Split namespaces: {list(data['namespaces'])}\n")
+
 if __name__ == "__main__":
     print("Testing Vector Store API\n")
     print("=" * 50 + "\n")
     
     try:
         test_health()
-        test_embed()
+        test_stats()
         test_upsert()
         test_search()
         test_patterns()
+        test_graph_query()
+        test_maintenance_dry_run()
+        test_metrics()
+        test_shards()
         
         print("=" * 50)
         print("All tests completed!")
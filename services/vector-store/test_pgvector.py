@@ -0,0 +1,108 @@
+"""Live checks for the pgvector backend against a local Postgres.
+
+Needs Postgres with pgvector, schema.sql and migrations/005 applied:
+
+    PGVECTOR_DSN=postgresql://localhost/dealvelocity python test_pgvector.py
+
+Uses the hashing embedder, so no OpenAI key is required. The checks are
+named ``check_*`` so pytest doesn't collect them without a database.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embeddings import HashingEmbedder
+from metadata_filter import matches_filter
+from pgvector_store import PgVectorStore
+
+NAMESPACE = "test-pgvector"
+
+DOCUMENTS = [
+    {"_id": "pg-doc1", "content": "Contractor shall indemnify the government against third party claims",
+     "clause_type": "indemnification", "outcome": "won", "value": 250000, "tags": ["far", "dfars"]},
+    {"_id": "pg-doc2", "content": "Liability is capped at the total fees paid under this agreement",
+     "clause_type": "limitation of liability", "outcome": "lost", "value": 90000, "tags": ["commercial"]},
+    {"_id": "pg-doc3", "content": "Either party may terminate for convenience with thirty days notice",
+     "clause_type": "termination", "outcome": "won", "value": 1200000},
+]
+
+def check_upsert(store):
+    """Test COPY-based bulk upsert, including overwrite of existing ids."""
+    result = store.upsert_documents(NAMESPACE, DOCUMENTS)
+    print(f"Upsert: {result}")
+    assert result["upserted"] == 3
+    store.upsert_documents(NAMESPACE, DOCUMENTS[:1])
+    assert len(store.list_ids(NAMESPACE)) == 3
+    print()
+
+def check_search(store):
+    """Test similarity search returns the closest clause first."""
+    results = store.search(NAMESPACE, "indemnify the government", top_k=2)
+    print(f"Search: {[(r['id'], round(r['score'], 3)) for r in results]}\n")
+    assert results[0]["id"] == "pg-doc1"
+    assert results[0]["fields"]["clause_type"] == "indemnification"
+
+def check_filters(store):
+    """Test that SQL filters select the same records as matches_filter."""
+    filters = [
+        {"outcome": "won"},
+        {"value": {"$gte": 250000}},
+        {"tags": "far"},
+        {"tags": {"$nin": ["commercial"]}},
+        {"$or": [{"outcome": "lost"}, {"value": {"$gt": 1000000}}]},
+        {"tags": {"$exists": False}},
+        {"outcome": {}},
+        {"$and": [{}, {"outcome": "won"}]},
+    ]
+    for filter in filters:
+        got = {r["id"] for r in store.search(NAMESPACE, "clause", top_k=10, filter=filter)}
+        expected = {d["_id"] for d in DOCUMENTS if matches_filter(d, filter)}
+        print(f"Filter {filter}: {sorted(got)}")
+        assert got == expected
+    print()
+
+def check_fetch_and_list(store):
+    """Test fetch by id and prefix listing."""
+    records = store.fetch(NAMESPACE, ["pg-doc2", "missing"])
+    print(f"Fetch: {list(records)}")
+    assert list(records) == ["pg-doc2"]
+    assert records["pg-doc2"]["fields"]["content"].startswith("Liability")
+    ids = store.list_ids(NAMESPACE, prefix="pg-doc", limit=2)
+    print(f"List: {ids}\n")
+    assert ids == ["pg-doc1", "pg-doc2", "pg-doc3"]
+
+def check_indexes(store):
+    """Test building and dropping an ivfflat index next to the HNSW one."""
+    name = store.create_index("ivfflat", lists=1)
+    indexes = [i["name"] for i in store.list_indexes()]
+    print(f"Indexes: {indexes}\n")
+    assert name in indexes
+    store.drop_index("ivfflat")
+
+def check_delete(store):
+    """Test deleting by id and clearing the namespace."""
+    store.delete(NAMESPACE, ids=["pg-doc3"])
+    assert store.fetch(NAMESPACE, ["pg-doc3"]) == {}
+    store.delete(NAMESPACE, delete_all=True)
+    assert store.list_ids(NAMESPACE) == []
+    print("Delete: ok\n")
+
+if __name__ == "__main__":
+    print("Testing pgvector backend\n")
+    print("=" * 50 + "\n")
+
+    store = PgVectorStore(embedder=HashingEmbedder())
+    try:
+        store.delete(NAMESPACE, delete_all=True)
+        check_upsert(store)
+        check_search(store)
+        check_filters(store)
+        check_fetch_and_list(store)
+        check_indexes(store)
+        check_delete(store)
+
+        print("=" * 50)
+        print("All tests completed!")
+    finally:
+        store.close()
@@ -1,33 +1,56 @@
 import os
-from typing import List, Dict, Any, Optional
-from pinecone import Pinecone
+import threading
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from common.instrumentation import stage
 import time
 
+MAX_DELETE_BATCH = 1000
+
 class VectorStore:
     def __init__(
         self,
         api_key: str = None,
-        index_name: str = "deal-velocity"
+        index_name: str = "deal-velocity",
+        client: Any = None
     ):
-        self.api_key = api_key or os.getenv("PINECONE_API_KEY")
-        if not self.api_key:
-            raise ValueError("PINECONE_API_KEY environment variable not set")
-        
-        self.pc = Pinecone(api_key=self.api_key)
+        """
+        Args:
+            api_key: Pinecone API key, defaults to PINECONE_API_KEY
+            index_name: Name of the index to bind to
+            client: Pre-built client exposing the Pinecone SDK surface
+                (e.g. ``FakePinecone`` for local runs); skips API key lookup
+        """
+        if client is not None:
+            self.api_key = api_key
+            self.pc = client
+        else:
+            self.api_key = api_key or os.getenv("PINECONE_API_KEY")
+            if not self.api_key:
+                raise ValueError("PINECONE_API_KEY environment variable not set")
+            # The SDK is imported and the client built on first use
+            self.pc = None
+
         self.index_name = index_name
         self.index = None
+        self._index_lock = threading.Lock()
         
     def get_index(self):
         """Get or initialize index connection."""
         if not self.index:
-            if not self.pc.has_index(self.index_name):
-                raise ValueError(
-                    f"Index '{self.index_name}' does not exist. "
-                    f"Create it using Pinecone CLI: "
-                    f"pc index create -n {self.index_name} -m cosine -c aws -r us-east-1 "
-                    f"--model llama-text-embed-v2 --field_map text=content"
-                )
-            self.index = self.pc.Index(self.index_name)
+            with self._index_lock:
+                if self.index:
+                    return self.index
+                if self.pc is None:
+                    from pinecone import Pinecone
+                    self.pc = Pinecone(api_key=self.api_key)
+                if not self.pc.has_index(self.index_name):
+                    raise ValueError(
+                        f"Index '{self.index_name}' does not exist. "
+                        f"Create it using Pinecone CLI: "
+                        f"pc index create -n {self.index_name} -m cosine -c aws -r us-east-1 "
+                        f"--model llama-text-embed-v2 --field_map text=content"
+                    )
+                self.index = self.pc.Index(self.index_name)
         return self.index
     
     def upsert_documents(
@@ -52,7 +75,8 @@ class VectorStore:
         # Process in batches (max 96 for text records, 2MB total)
         for i in range(0, len(documents), batch_size):
             batch = documents[i:i + batch_size]
-            index.upsert_records(namespace, batch)
+            with stage("pinecone.upsert", namespace=namespace, records=len(batch)):
+                index.upsert_records(namespace, batch)
             upserted_count += len(batch)
             time.sleep(0.1)  # Rate limiting
             
@@ -99,7 +123,12 @@ class VectorStore:
                 "rank_fields": ["content"]
             }
         
-        results = index.search(**search_params)
+        # Embedding and reranking both happen inside Pinecone; keep them as
+        # separate stages so reranked and plain searches can be compared
+        stage_name = "pinecone.search_rerank" if rerank else "pinecone.search"
+        with stage(stage_name, namespace=namespace, top_k=top_k) as span:
+            results = index.search(**search_params)
+            span.set("hits", len(results.result.hits))
         
         # Parse results - with reranking, use dict-style access
         parsed_results = []
@@ -123,7 +152,8 @@ class VectorStore:
             raise ValueError("Namespace is required")
         
         index = self.get_index()
-        result = index.fetch(namespace=namespace, ids=ids)
+        with stage("pinecone.fetch", namespace=namespace, ids=len(ids)):
+            result = index.fetch(namespace=namespace, ids=ids)
         
         # Convert to dict format
         records = {}
@@ -143,28 +173,46 @@ class VectorStore:
         limit: int = 1000
     ) -> List[str]:
         """List record IDs with optional prefix filter."""
+        all_ids = []
+        for ids, _ in self.iter_id_pages(namespace, prefix=prefix, page_size=limit):
+            all_ids.extend(ids)
+        return all_ids
+
+    def iter_id_pages(
+        self,
+        namespace: str,
+        prefix: Optional[str] = None,
+        page_size: int = 100,
+        cursor: Optional[str] = None
+    ) -> Iterator[Tuple[List[str], Optional[str]]]:
+        """Yield pages of record IDs without materializing the namespace.
+
+        Args:
+            cursor: Token from a previous page to resume after
+
+        Yields:
+            (ids, cursor to resume after this page; None on the last page)
+        """
         if not namespace:
             raise ValueError("Namespace is required")
-        
+
         index = self.get_index()
-        all_ids = []
-        pagination_token = None
-        
+        pagination_token = cursor
+
         while True:
-            result = index.list(
-                namespace=namespace,
-                prefix=prefix,
-                limit=limit,
-                pagination_token=pagination_token
-            )
-            
-            all_ids.extend([record.id for record in result.records])
-            
+            with stage("pinecone.list", namespace=namespace):
+                result = index.list(
+                    namespace=namespace,
+                    prefix=prefix,
+                    limit=page_size,
+                    pagination_token=pagination_token
+                )
+
             if not result.pagination or not result.pagination.next:
-                break
+                yield [record.id for record in result.records], None
+                return
             pagination_token = result.pagination.next
-        
-        return all_ids
+            yield [record.id for record in result.records], pagination_token
     
     def delete(
         self,
@@ -179,10 +227,15 @@ class VectorStore:
         index = self.get_index()
         
         if delete_all:
-            index.delete(namespace=namespace, delete_all=True)
+            with stage("pinecone.delete", namespace=namespace):
+                index.delete(namespace=namespace, delete_all=True)
             return {"deleted": "all"}
         elif ids:
-            index.delete(namespace=namespace, ids=ids)
+            # Pinecone accepts at most 1000 ids per delete call
+            for i in range(0, len(ids), MAX_DELETE_BATCH):
+                batch = ids[i:i + MAX_DELETE_BATCH]
+                with stage("pinecone.delete", namespace=namespace, ids=len(batch)):
+                    index.delete(namespace=namespace, ids=batch)
             return {"deleted": len(ids)}
         else:
             raise ValueError("Must provide either ids or delete_all=True")
@@ -190,7 +243,8 @@ class VectorStore:
     def get_stats(self) -> Dict[str, Any]:
         """Get index statistics."""
         index = self.get_index()
-        stats = index.describe_index_stats()
+        with stage("pinecone.stats"):
+            stats = index.describe_index_stats()
         
         return {
             "total_vector_count": stats.total_vector_count,